@@ -0,0 +1,255 @@
+import numpy as np
+import pandas as pd
+
+# --- Cube d'agrégats des retards ---
+# Une ligne par (gare de départ, gare d'arrivée, année, mois) avec les sommes,
+# les effectifs et les sommes de carrés des retards. Les moyennes, écarts-types
+# et taux de ponctualité des pages du dashboard se lisent en sommant ce cube
+# au lieu de re-parcourir tout le dataset à chaque interaction.
+
+CUBE_KEYS = ["departure_station", "arrival_station", "year", "month"]
+
+DELAY_COLUMNS = {"dep": "avg_dep_delay", "arr": "avg_arr_delay"}
+
+# Seuil de ponctualité utilisé par la page "Statistiques des retards"
+PUNCTUALITY_THRESHOLD = 5
+
+# Bornes (retard moyen, min) des notes de fiabilité : <= 2 -> 5 étoiles,
+# <= 5 -> 4, <= 10 -> 3, <= 15 -> 2, au-delà -> 1
+RELIABILITY_THRESHOLDS = [2, 5, 10, 15]
+# Clé "toutes années" des classements pré-calculés
+ALL_YEARS = 0
+
+
+def build_cube(df):
+    parts = pd.DataFrame({key: df[key] for key in CUBE_KEYS})
+    for prefix, col in DELAY_COLUMNS.items():
+        values = df[col].astype("float64")
+        parts[f"{prefix}_sum"] = values
+        parts[f"{prefix}_count"] = values.notna().astype("int64")
+        parts[f"{prefix}_sumsq"] = values**2
+    parts["rows"] = 1
+    parts["punctual"] = (df["avg_arr_delay"] <= PUNCTUALITY_THRESHOLD).astype("int64")
+
+    # sum() ignore les NaN, comme mean()/std() sur le dataset complet
+    return (
+        parts.groupby(CUBE_KEYS, observed=True, dropna=False, sort=False)
+        .sum()
+        .reset_index()
+    )
+
+
+def cube_mask(cube, departure=None, arrival=None, year=None):
+    mask = np.ones(len(cube), dtype=bool)
+    if departure is not None:
+        mask &= (cube["departure_station"] == departure).to_numpy()
+    if arrival is not None:
+        mask &= (cube["arrival_station"] == arrival).to_numpy()
+    if year is not None:
+        mask &= (cube["year"] == year).to_numpy()
+    return mask
+
+
+def rollup(cube, by):
+    measures = [col for col in cube.columns if col not in CUBE_KEYS]
+    return cube.groupby(by, observed=True, sort=False)[measures].sum()
+
+
+def _mean(table, prefix):
+    return table[f"{prefix}_sum"] / table[f"{prefix}_count"].where(
+        table[f"{prefix}_count"] > 0
+    )
+
+
+def _std(table, prefix):
+    n = table[f"{prefix}_count"]
+    var = (table[f"{prefix}_sumsq"] - table[f"{prefix}_sum"] ** 2 / n.where(n > 0)) / (
+        n - 1
+    ).where(n > 1)
+    return np.sqrt(var.clip(lower=0))
+
+
+def delay_stats(cube, departure=None, arrival=None):
+    # Retard moyen, écart-type et taux de ponctualité (%) à l'arrivée
+    totals = cube.loc[cube_mask(cube, departure, arrival)].drop(columns=CUBE_KEYS).sum()
+    return totals_stats(totals)
+
+
+def totals_stats(totals):
+    # totals : sommes des mesures du cube (Series), ici ou côté moteur SQL
+    if totals["rows"] == 0:
+        return None
+    table = totals.to_frame().T
+    avg_delay = _mean(table, "arr").iloc[0]
+    delay_std = _std(table, "arr").iloc[0]
+    punctuality_rate = totals["punctual"] / totals["rows"] * 100
+    return avg_delay, delay_std, punctuality_rate
+
+
+def station_year_table(cube, station_col):
+    # Agrégat (gare, année) : quelques centaines de lignes par année
+    return rollup(cube, [station_col, "year"]).reset_index()
+
+
+def station_means(table, station_col, prefix, year=None):
+    if year is not None:
+        table = table[table["year"] == year]
+    per_station = table.groupby(station_col, observed=True, sort=False)[
+        [f"{prefix}_sum", f"{prefix}_count"]
+    ].sum()
+    return _mean(per_station, prefix).dropna()
+
+
+def top_stations(table, station_col, prefix, year=None, n=10, ascending=False):
+    means = station_means(table, station_col, prefix, year)
+    if ascending:
+        return means.nsmallest(n)
+    return means.nlargest(n)
+
+
+def reliability_scores(delays, thresholds=RELIABILITY_THRESHOLDS):
+    # Note de 1 à len(thresholds) + 1 étoiles, bornes incluses
+    bins = np.digitize(np.asarray(delays, dtype="float64"), thresholds, right=True)
+    return len(thresholds) + 1 - bins
+
+
+def parse_thresholds(value):
+    # "2,5,10,15" -> [2.0, 5.0, 10.0, 15.0] ; bornes numériques strictement
+    # croissantes, sinon np.digitize échoue ou décale les étoiles
+    try:
+        thresholds = [float(item) for item in value.split(",")]
+    except ValueError:
+        raise ValueError(f"bornes non numériques : {value!r}")
+    if not all(np.isfinite(thresholds)):
+        raise ValueError(f"bornes non finies : {value!r}")
+    if any(low >= high for low, high in zip(thresholds, thresholds[1:])):
+        raise ValueError(f"bornes non strictement croissantes : {value!r}")
+    return thresholds
+
+
+def _reliability_frame(totals, prefix, thresholds):
+    frame = pd.DataFrame(
+        {
+            "mean": _mean(totals, prefix),
+            "punctuality": totals["punctual"] / totals["rows"].where(totals["rows"] > 0) * 100,
+        }
+    ).dropna(subset=["mean"])
+    frame["score"] = reliability_scores(frame["mean"], thresholds)
+    return frame
+
+
+def top_reliable(reliability, n=10):
+    # Les n meilleures gares : note décroissante, puis retard moyen croissant,
+    # puis ponctualité décroissante ; sélection partielle, les ex aequo du
+    # n-ième sont gardés pour le départage par nom
+    keys = pd.DataFrame(
+        {
+            "score": -reliability["score"],
+            "mean": reliability["mean"],
+            "punctuality": -reliability["punctuality"].fillna(-np.inf),
+        }
+    )
+    selected = keys.nsmallest(n, ["score", "mean", "punctuality"], keep="all").index
+    return reliability.loc[selected]
+
+
+def reliability_rankings(
+    table, station_col, prefix, thresholds=RELIABILITY_THRESHOLDS, n=None
+):
+    # Classements de toutes les années (et de la période complète, année
+    # ALL_YEARS) en un passage : notes vectorisées puis un seul tri
+    # lexicographique. Avec n, seules les n premières gares de chaque année
+    # sont sélectionnées puis triées.
+    measures = [f"{prefix}_sum", f"{prefix}_count", "punctual", "rows"]
+    per_year = table.groupby([station_col, "year"], observed=True, sort=False)[measures].sum()
+    overall = table.groupby(station_col, observed=True, sort=False)[measures].sum()
+    overall.index = pd.MultiIndex.from_arrays(
+        [overall.index, np.full(len(overall), ALL_YEARS)], names=[station_col, "year"]
+    )
+    frame = _reliability_frame(pd.concat([overall, per_year]), prefix, thresholds).reset_index()
+    frame[station_col] = frame[station_col].astype(str)
+    if n is not None and len(frame):
+        frame = pd.concat(
+            [top_reliable(group, n) for _, group in frame.groupby("year", sort=False)]
+        )
+
+    order = np.lexsort(
+        (
+            frame[station_col].to_numpy(),
+            -frame["punctuality"].fillna(-np.inf).to_numpy(),
+            frame["mean"].to_numpy(),
+            -frame["score"].to_numpy(),
+            frame["year"].to_numpy(),
+        )
+    )
+    frame = frame.iloc[order].reset_index(drop=True)
+    frame["rank"] = frame.groupby("year", sort=False).cumcount() + 1
+    if n is not None:
+        frame = frame[frame["rank"] <= n].reset_index(drop=True)
+    return frame
+
+
+def zone_means(table, station_col, prefix, zones, year=None):
+    # zones : {zone: [gares]} ; retard moyen, taux de ponctualité et volume par
+    # zone, en une jointure sur la table (gare, année)
+    if year is not None:
+        table = table[table["year"] == year]
+    members = pd.DataFrame(
+        [(zone, station) for zone, stations in zones.items() for station in stations],
+        columns=["zone", station_col],
+    )
+    keyed = table.assign(**{station_col: table[station_col].astype(str)}).merge(
+        members, on=station_col
+    )
+    per_zone = keyed.groupby("zone", sort=False)[
+        [f"{prefix}_sum", f"{prefix}_count", "punctual", "rows"]
+    ].sum()
+    per_zone = per_zone.reindex(list(zones), fill_value=0)
+    rows = per_zone["rows"].where(per_zone["rows"] > 0)
+    return pd.DataFrame(
+        {
+            "mean": _mean(per_zone, prefix),
+            "punctuality": per_zone["punctual"] / rows * 100,
+            "stations": keyed.groupby("zone", sort=False)[station_col]
+            .nunique()
+            .reindex(list(zones), fill_value=0),
+            "rows": per_zone["rows"],
+        }
+    )
+
+
+class StationGraph:
+    # Listes de gares et adjacences départ <-> arrivée pour les sélecteurs
+    # dépendants, construites une fois à partir des trajets du cube
+
+    def __init__(self, routes):
+        routes = routes.dropna().drop_duplicates()
+        departures = routes["departure_station"].astype(str)
+        arrivals = routes["arrival_station"].astype(str)
+
+        self.departures = sorted(departures.unique())
+        self.arrivals = sorted(arrivals.unique())
+        self.stations = sorted(set(self.departures) | set(self.arrivals))
+
+        self.arrivals_from = {}
+        self.departures_to = {}
+        for departure, arrival in zip(departures, arrivals):
+            self.arrivals_from.setdefault(departure, []).append(arrival)
+            self.departures_to.setdefault(arrival, []).append(departure)
+        for adjacency in (self.arrivals_from, self.departures_to):
+            for station, neighbours in adjacency.items():
+                adjacency[station] = sorted(neighbours)
+
+    @classmethod
+    def from_cube(cls, cube):
+        return cls(cube[["departure_station", "arrival_station"]])
+
+    def possible_arrivals(self, departure=None):
+        if departure is None:
+            return self.arrivals
+        return self.arrivals_from.get(departure, [])
+
+    def possible_departures(self, arrival=None):
+        if arrival is None:
+            return self.departures
+        return self.departures_to.get(arrival, [])
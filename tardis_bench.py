@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import tardis_aggregates
+import tardis_features
+import tardis_loaders
+import tardis_predict
+import tardis_reasons
+import tardis_stations
+import tardis_store
+
+# --- Benchmarks des chemins critiques ---
+# Mesure temps, pic mémoire (tracemalloc) et débit des chemins chauds du
+# dashboard et du modèle, sur le dataset réel et sur des copies agrandies
+# (10x, 100x). Résultat en JSON pour comparer deux exécutions :
+#
+#   python tardis_bench.py --scales 1 10 100 -o bench.json
+#   python tardis_bench.py --scales 1 10 -o new.json --compare bench.json
+
+RAW_PATH = "dataset.csv"
+DEFAULT_SCALES = [1, 10, 100]
+DEFAULT_REPEAT = 3
+SIMULATOR_QUERIES = 200
+REGRESSION_THRESHOLD = 1.2
+
+
+def scale_frame(df, scale):
+    # Copie agrandie par répétition des lignes
+    if scale == 1:
+        return df
+    return pd.concat([df] * scale, ignore_index=True)
+
+
+def measure(func, repeat):
+    # Temps médian/minimal sur repeat exécutions, pic mémoire sur la première
+    timings = []
+    peak = 0
+    for i in range(repeat):
+        if i == 0:
+            tracemalloc.start()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+        if i == 0:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return timings, peak
+
+
+def _load_dashboard_data(csv_path):
+    # Chargeur réel du dashboard, sans son cache Streamlit
+    return tardis_loaders.read_data(compact=False, csv_path=csv_path)
+
+
+def _rankings_groupby(df):
+    # Chemin historique : groupby complet par page et par année
+    for year in [None] + sorted(df["year"].unique()):
+        frame = df if year is None else df[df["year"] == year]
+        for station_col, value in [
+            ("departure_station", "avg_dep_delay"),
+            ("arrival_station", "avg_arr_delay"),
+        ]:
+            frame.groupby(station_col, observed=True)[value].mean().sort_values(
+                ascending=False
+            ).head(10)
+
+
+def _rankings_cube(tables, years):
+    for year in [None] + years:
+        for station_col, prefix in [("departure_station", "dep"), ("arrival_station", "arr")]:
+            tardis_aggregates.top_stations(tables[station_col], station_col, prefix, year)
+            tardis_aggregates.station_means(tables[station_col], station_col, prefix, year)
+
+
+def _reliability_rankings(tables):
+    # Classements de fiabilité de toutes les années en un passage
+    for station_col, prefix in [("departure_station", "dep"), ("arrival_station", "arr")]:
+        tardis_aggregates.reliability_rankings(tables[station_col], station_col, prefix)
+
+
+def _simulator_queries(df, count):
+    sample = df.sample(n=min(count, len(df)), random_state=42, replace=len(df) < count)
+    return tardis_predict.normalize_queries(
+        pd.DataFrame(
+            {
+                "departure_station": sample["departure_station"].astype(str),
+                "arrival_station": sample["arrival_station"].astype(str),
+                "month": sample["date"].dt.month,
+                "avg_dep_delay": sample["avg_dep_delay"].fillna(0),
+            }
+        )
+    )
+
+
+def _clean_stations(raw, gares):
+    matcher = tardis_stations.StationMatcher.from_gares(gares)
+    for col in ["Departure station", "Arrival station"]:
+        matcher.clean(raw[col].str.lower().str.strip())
+
+
+def build_cases(csv_path, raw, gares, model):
+    # Chaque cas : (nom, fonction préparée, nombre de lignes traitées)
+    df = _load_dashboard_data(csv_path)
+    cube = tardis_aggregates.build_cube(df)
+    tables = {
+        col: tardis_aggregates.station_year_table(cube, col)
+        for col in ["departure_station", "arrival_station"]
+    }
+    years = sorted(df["year"].unique())
+
+    cases = [
+        ("load_data", lambda: _load_dashboard_data(csv_path), len(df)),
+        ("rankings_groupby", lambda: _rankings_groupby(df), len(df)),
+        ("cube_build", lambda: tardis_aggregates.build_cube(df), len(df)),
+        ("rankings_cube", lambda: _rankings_cube(tables, years), len(df)),
+        ("reliability_rankings", lambda: _reliability_rankings(tables), len(df)),
+        (
+            "group_delay_reasons_by_date",
+            lambda: tardis_reasons.group_delay_reasons_by_date(df),
+            len(df),
+        ),
+        ("feature_store_build", lambda: tardis_features.FeatureStore.build(df), len(df)),
+    ]
+    if model is not None:
+        feature_store = tardis_features.FeatureStore.build(df)
+        single = _simulator_queries(df, SIMULATOR_QUERIES)
+        batch = _simulator_queries(df, len(df))
+
+        def simulator_single():
+            for query in single.itertuples(index=False):
+                X = feature_store.simulator_frame(
+                    query.departure_station, query.arrival_station, query.month, query.avg_dep_delay
+                )
+                model.predict(X)
+
+        cases.append(("simulator_single_predict", simulator_single, len(single)))
+        cases.append(
+            (
+                "predict_batch",
+                lambda: tardis_predict.predict_frame(model, feature_store, batch),
+                len(batch),
+            )
+        )
+    if raw is not None and gares is not None:
+        cases.append(("station_cleaning", lambda: _clean_stations(raw, gares), len(raw)))
+    return cases
+
+
+def run(scales, repeat, csv_path, raw_path, gares_path, model_path):
+    base = tardis_store.load_cleaned(csv_path)
+    raw = pd.read_csv(raw_path, sep=";", on_bad_lines="skip") if os.path.exists(raw_path) else None
+    gares = tardis_stations.load_gares(gares_path) if os.path.exists(gares_path) else None
+    model = (
+        tardis_predict.load_model(model_path, light=False)
+        if os.path.exists(model_path)
+        else None
+    )
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            # Copie agrandie écrite sur disque (CSV + store) pour mesurer le chargement réel
+            scaled_csv = os.path.join(tmp, f"cleaned_x{scale}.csv")
+            scaled = scale_frame(base, scale)
+            scaled.to_csv(scaled_csv, index=False, sep=";")
+            tardis_store.write_store(scaled, scaled_csv)
+            scaled_raw = scale_frame(raw, scale) if raw is not None else None
+
+            for name, func, rows in build_cases(scaled_csv, scaled_raw, gares, model):
+                timings, peak = measure(func, repeat)
+                median = statistics.median(timings)
+                results.append(
+                    {
+                        "case": name,
+                        "scale": scale,
+                        "rows": int(rows),
+                        "repeat": repeat,
+                        "wall_s_median": median,
+                        "wall_s_min": min(timings),
+                        "peak_mem_mb": peak / 1e6,
+                        "rows_per_s": rows / median if median > 0 else None,
+                    }
+                )
+                print(
+                    f"⏱ {name:<28} x{scale:<4} {median * 1000:10.2f} ms "
+                    f"{peak / 1e6:9.1f} Mo {rows / median:14,.0f} lignes/s",
+                    file=sys.stderr,
+                )
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    # Liste des cas dont le temps médian a augmenté de plus de threshold
+    previous = {(r["case"], r["scale"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get((result["case"], result["scale"]))
+        if before is None or before["wall_s_median"] <= 0:
+            continue
+        ratio = result["wall_s_median"] / before["wall_s_median"]
+        if ratio > threshold:
+            regressions.append(
+                {"case": result["case"], "scale": result["scale"], "ratio": ratio}
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks TARDIS")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--data", default=tardis_store.CSV_PATH)
+    parser.add_argument("--raw", default=RAW_PATH)
+    parser.add_argument("--gares", default=tardis_stations.GARES_PATH)
+    parser.add_argument("--model", default=tardis_predict.MODEL_PATH)
+    parser.add_argument("-o", "--output", default="-", help="Résultats JSON (défaut : stdout)")
+    parser.add_argument("--compare", help="JSON d'une exécution précédente")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    report = run(args.scales, args.repeat, args.data, args.raw, args.gares, args.model)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["regressions"] = compare(report, json.load(f), args.threshold)
+        for regression in report["regressions"]:
+            print(
+                f"❌ Régression {regression['case']} x{regression['scale']} : "
+                f"{regression['ratio']:.2f}x plus lent",
+                file=sys.stderr,
+            )
+
+    payload = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(payload)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,344 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import tardis_stations
+import tardis_store
+
+# --- Nettoyage du dataset brut par morceaux ---
+# Reprend les étapes de nettoyage de tardis_eda.ipynb sous forme d'étapes
+# génératrices appliquées à des morceaux de taille bornée de dataset.csv :
+# la mémoire ne dépend pas de la taille du fichier. Toutes les règles sont
+# locales à une ligne, le résultat est identique à celui du notebook.
+#
+#   python tardis_cleaning.py dataset.csv -o cleaned_dataset.csv
+
+RAW_PATH = "dataset.csv"
+CITIES_PATH = "worldcities.csv"
+DEFAULT_CHUNKSIZE = 50_000
+
+RAW_COLUMNS = {
+    "Date": "date",
+    "Departure station": "departure_station",
+    "Arrival station": "arrival_station",
+    "Average delay of all trains at departure": "avg_dep_delay",
+    "Average delay of all trains at arrival": "avg_arr_delay",
+    "Number of scheduled trains": "scheduled_trains",
+    "Number of cancelled trains": "cancelled_trains",
+    "Arrival delay comments": "arrival_delay_comments",
+    "Number of trains delayed at departure": "trains_delayed_dep",
+    "Number of trains delayed at arrival": "trains_delayed_arr",
+    "Departure delay comments": "departure_delay_comments",
+    "Number of trains delayed > 15min": "trains_delayed_15min",
+    "Number of trains delayed > 30min": "trains_delayed_30min",
+    "Number of trains delayed > 60min": "trains_delayed_60min",
+    "Pct delay due to external causes": "pct_delay_external",
+    "Pct delay due to infrastructure": "pct_delay_infrastructure",
+    "Pct delay due to traffic management": "pct_delay_traffic_mgmt",
+    "Pct delay due to rolling stock": "pct_delay_rolling_stock",
+    "Pct delay due to station management and equipment reuse": "pct_delay_station_mgmt",
+    "Pct delay due to passenger handling (crowding, disabled persons, connections)": "pct_delay_passenger",
+}
+
+NUMERIC_COLUMNS = [
+    "avg_dep_delay",
+    "avg_arr_delay",
+    "scheduled_trains",
+    "cancelled_trains",
+    "trains_delayed_dep",
+    "trains_delayed_arr",
+    "trains_delayed_15min",
+    "trains_delayed_30min",
+    "trains_delayed_60min",
+    "pct_delay_external",
+    "pct_delay_infrastructure",
+    "pct_delay_traffic_mgmt",
+    "pct_delay_rolling_stock",
+    "pct_delay_station_mgmt",
+    "pct_delay_passenger",
+]
+CAPPED_COLUMNS = ["cancelled_trains", "trains_delayed_dep", "trains_delayed_arr"]
+ZERO_FILL_COLUMNS = [
+    "trains_delayed_15min",
+    "trains_delayed_30min",
+    "trains_delayed_60min",
+    "pct_delay_external",
+    "pct_delay_infrastructure",
+    "pct_delay_traffic_mgmt",
+    "pct_delay_rolling_stock",
+    "pct_delay_station_mgmt",
+    "pct_delay_passenger",
+]
+ESSENTIAL_COLUMNS = ["date", "departure_station", "avg_dep_delay", "scheduled_trains"]
+COMMENT_COLUMNS = ["arrival_delay_comments", "departure_delay_comments"]
+YEAR_MIN, YEAR_MAX = 2018, 2024
+# Format des dates du dataset SNCF ("2018-01"), fixé pour que chaque morceau
+# soit parsé comme le fichier complet dans le notebook
+DATE_FORMAT = "%Y-%m"
+
+OUTPUT_COLUMNS = list(RAW_COLUMNS.values()) + ["month", "year", "route", "trains_arrives"]
+
+# Lignes restantes après chaque règle, dans l'ordre des messages du notebook
+RULE_STEPS = [
+    ("rows_read", "Lignes lues"),
+    ("after_year_filter", f"Lignes conservées entre {YEAR_MIN} et {YEAR_MAX}"),
+    ("after_dropna", "after suppression des lignes incomplètes"),
+    ("after_scheduled", "after 'scheduled_trains > 0'"),
+    ("after_cancelled", "after 'cancelled_trains >= 0 et <= scheduled_trains'"),
+    ("after_delayed_dep", "after 'trains_delayed_dep >= 0 et <= scheduled_trains'"),
+    ("after_delayed_arr", "after 'trains_delayed_arr >= 0 et <= scheduled_trains'"),
+]
+REPORT_STEPS = RULE_STEPS + [
+    ("after_stations", "Lignes conservées après correction des gares"),
+]
+
+
+def new_report():
+    return dict.fromkeys((key for key, _ in REPORT_STEPS), 0)
+
+
+def print_report(report, steps=REPORT_STEPS):
+    # Lignes restantes et lignes rejetées par chaque règle
+    previous = None
+    for key, label in steps:
+        rejected = "" if previous is None else f" ({previous - report[key]} rejetées)"
+        print(f"✅ {label} : {report[key]} lignes{rejected}")
+        previous = report[key]
+
+
+# --- Moteur de règles vectorisé ---
+# Les règles de cohérence portent toutes sur le bloc numérique : on le
+# convertit une fois en tableau NumPy (lignes x colonnes), on corrige les
+# valeurs colonne par colonne en une opération, puis chaque filtre devient
+# un masque booléen. Les masques sont cumulés dans l'ordre du notebook : la
+# dernière ligne est le masque de validité combiné, les sommes intermédiaires
+# donnent les lignes restantes après chaque règle.
+
+_CAPPED = [NUMERIC_COLUMNS.index(col) for col in CAPPED_COLUMNS]
+_ZERO_FILL = [NUMERIC_COLUMNS.index(col) for col in ZERO_FILL_COLUMNS]
+_SCHEDULED = NUMERIC_COLUMNS.index("scheduled_trains")
+_ESSENTIAL_NUMERIC = [
+    NUMERIC_COLUMNS.index(col) for col in ESSENTIAL_COLUMNS if col in NUMERIC_COLUMNS
+]
+_ESSENTIAL_OTHER = [col for col in ESSENTIAL_COLUMNS if col not in NUMERIC_COLUMNS]
+
+
+def correct_block(block):
+    # Corrections en place sur le tableau (lignes x NUMERIC_COLUMNS)
+    scheduled = block[:, _SCHEDULED]
+    capped = block[:, _CAPPED]
+    # < 0 ramené à 0 (NaN conservé), puis limité à scheduled_trains : fmin
+    # ignore le NaN comme min(axis=1) de pandas
+    capped = np.where(capped < 0, 0, capped)
+    block[:, _CAPPED] = np.fmin(capped, scheduled[:, None])
+    # Compteurs > 15/30/60 min et pourcentages : 0 si null ou négatif
+    zero_fill = block[:, _ZERO_FILL]
+    block[:, _ZERO_FILL] = np.where(np.isnan(zero_fill) | (zero_fill < 0), 0, zero_fill)
+    return block
+
+
+def rule_masks(chunk, block):
+    # Un masque par règle de filtrage, dans l'ordre de RULE_STEPS[1:]
+    years = chunk["date"].dt.year.to_numpy(dtype="float64", na_value=np.nan)
+    scheduled = block[:, _SCHEDULED]
+    masks = [
+        (years >= YEAR_MIN) & (years <= YEAR_MAX),
+        ~np.isnan(block[:, _ESSENTIAL_NUMERIC]).any(axis=1)
+        & chunk[_ESSENTIAL_OTHER].notna().all(axis=1).to_numpy(),
+        scheduled > 0,
+    ]
+    for index in _CAPPED:
+        masks.append((block[:, index] >= 0) & (block[:, index] <= scheduled))
+    return np.vstack(masks)
+
+
+def clean_block(chunk):
+    # Applique toutes les règles en un passage ; renvoie le morceau filtré et
+    # le nombre de lignes restantes après chaque règle
+    block = chunk[NUMERIC_COLUMNS].to_numpy(dtype="float64", na_value=np.nan, copy=True)
+    correct_block(block)
+    cumulative = np.logical_and.accumulate(rule_masks(chunk, block), axis=0)
+    valid = cumulative[-1]
+
+    cleaned = chunk.loc[valid].copy()
+    cleaned[NUMERIC_COLUMNS] = block[valid]
+    return cleaned, cumulative.sum(axis=1)
+
+
+# --- Étapes du pipeline (générateurs de morceaux) ---
+def read_raw_chunks(path=RAW_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    # Colonnes texte typées explicitement : un morceau entièrement vide reste texte
+    text_columns = ["Date", "Departure station", "Arrival station"] + [
+        raw for raw, col in RAW_COLUMNS.items() if col in COMMENT_COLUMNS
+    ]
+    yield from pd.read_csv(
+        path,
+        sep=";",
+        on_bad_lines="skip",
+        chunksize=chunksize,
+        dtype=dict.fromkeys(text_columns, "str"),
+    )
+
+
+def select_columns(chunks):
+    for chunk in chunks:
+        yield chunk[list(RAW_COLUMNS)].rename(columns=RAW_COLUMNS)
+
+
+def convert_types(chunks):
+    for chunk in chunks:
+        chunk["departure_station"] = chunk["departure_station"].str.lower().str.strip()
+        chunk["arrival_station"] = chunk["arrival_station"].str.lower().str.strip()
+        for col in NUMERIC_COLUMNS:
+            chunk[col] = pd.to_numeric(chunk[col], errors="coerce")
+        chunk["date"] = pd.to_datetime(chunk["date"], format=DATE_FORMAT, errors="coerce")
+        yield chunk
+
+
+def apply_rules(chunks, report):
+    for chunk in chunks:
+        report["rows_read"] += len(chunk)
+        chunk, remaining = clean_block(chunk)
+        for (key, _), count in zip(RULE_STEPS[1:], remaining):
+            report[key] += int(count)
+        yield chunk
+
+
+def validate_stations(chunks, matcher, report):
+    for chunk in chunks:
+        chunk["departure_station"] = matcher.clean(chunk["departure_station"])
+        chunk["arrival_station"] = matcher.clean(chunk["arrival_station"])
+        chunk = chunk[chunk["departure_station"].notna() & chunk["arrival_station"].notna()]
+        report["after_stations"] += len(chunk)
+        if len(chunk):
+            yield chunk
+
+
+def enrich(chunks):
+    for chunk in chunks:
+        chunk["month"] = chunk["date"].dt.month.astype("Int64")
+        chunk["year"] = chunk["date"].dt.year.astype("Int64")
+        chunk["route"] = chunk["departure_station"] + " ➜ " + chunk["arrival_station"]
+        chunk["trains_arrives"] = (
+            chunk["scheduled_trains"] - chunk["cancelled_trains"]
+        ).clip(lower=1)
+        yield chunk[OUTPUT_COLUMNS]
+
+
+def _store_types(chunk):
+    # Types fixes d'un morceau à l'autre pour le schéma Parquet
+    chunk = chunk.copy()
+    for col in COMMENT_COLUMNS + ["departure_station", "arrival_station", "route"]:
+        chunk[col] = chunk[col].astype(object).where(chunk[col].notna(), None)
+    for col in NUMERIC_COLUMNS + ["trains_arrives"]:
+        chunk[col] = chunk[col].astype("float64")
+    for col in ["month", "year"]:
+        chunk[col] = chunk[col].astype("int64")
+    chunk["date"] = chunk["date"].astype("datetime64[us]")
+    return chunk
+
+
+def _store_schema():
+    import pyarrow as pa
+
+    fields = []
+    for col in OUTPUT_COLUMNS:
+        if col == "date":
+            fields.append((col, pa.timestamp("us")))
+        elif col in ("month", "year"):
+            fields.append((col, pa.int64()))
+        elif col in NUMERIC_COLUMNS or col == "trains_arrives":
+            fields.append((col, pa.float64()))
+        else:
+            fields.append((col, pa.string()))
+    return pa.schema(fields)
+
+
+def write_cleaned(chunks, csv_path=tardis_store.CSV_PATH, store=True):
+    # Écriture incrémentale du CSV nettoyé et, si pyarrow est présent, du store
+    writer = None
+    if store:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            schema = _store_schema()
+            writer = pq.ParquetWriter(tardis_store.store_path(csv_path) + ".tmp", schema)
+        except ImportError:
+            writer = None
+
+    total = 0
+    try:
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, index=False, sep=";", header=(i == 0))
+                if writer is not None:
+                    table = pa.Table.from_pandas(
+                        _store_types(chunk), schema=schema, preserve_index=False
+                    )
+                    writer.write_table(table)
+                total += len(chunk)
+            if total == 0:
+                pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(f, index=False, sep=";")
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        # Le store est publié après le CSV : il n'est donc jamais plus ancien
+        os.replace(tardis_store.store_path(csv_path) + ".tmp", tardis_store.store_path(csv_path))
+    return total
+
+
+def default_matcher(gares_path=tardis_stations.GARES_PATH, cities_path=CITIES_PATH):
+    villes_valides = set()
+    if os.path.exists(cities_path):
+        cities = pd.read_csv(cities_path)
+        villes_valides = set(cities["city_ascii"].str.lower().str.strip().unique())
+    return tardis_stations.StationMatcher.from_gares(
+        tardis_stations.load_gares(gares_path), villes_valides
+    )
+
+
+def clean_chunks(chunks, matcher, report):
+    chunks = select_columns(chunks)
+    chunks = convert_types(chunks)
+    chunks = apply_rules(chunks, report)
+    chunks = validate_stations(chunks, matcher, report)
+    return enrich(chunks)
+
+
+def clean_dataset(
+    raw_path=RAW_PATH,
+    csv_path=tardis_store.CSV_PATH,
+    matcher=None,
+    chunksize=DEFAULT_CHUNKSIZE,
+    store=True,
+):
+    if matcher is None:
+        matcher = default_matcher()
+    report = new_report()
+    chunks = clean_chunks(read_raw_chunks(raw_path, chunksize), matcher, report)
+    write_cleaned(chunks, csv_path, store)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nettoyage par morceaux de dataset.csv")
+    parser.add_argument("raw", nargs="?", default=RAW_PATH)
+    parser.add_argument("-o", "--output", default=tardis_store.CSV_PATH)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--gares", default=tardis_stations.GARES_PATH)
+    parser.add_argument("--cities", default=CITIES_PATH)
+    parser.add_argument("--no-store", action="store_true", help="Ne pas écrire le store Parquet")
+    args = parser.parse_args(argv)
+
+    matcher = default_matcher(args.gares, args.cities)
+    report = clean_dataset(args.raw, args.output, matcher, args.chunksize, not args.no_store)
+    print_report(report)
+    print(f"💾 Données nettoyées exportées dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
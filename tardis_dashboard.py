@@ -1,9 +1,39 @@
+import os
+
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
-import joblib
-from collections import defaultdict
+import altair as alt
 from datetime import datetime
 
+import tardis_aggregates
+import tardis_metrics
+import tardis_predict
+import tardis_reasons
+import tardis_render
+import tardis_store
+from tardis_loaders import (
+    METRICS,
+    RELIABILITY_THRESHOLDS,
+    SQL_BACKEND,
+    load_card_fragments,
+    load_data,
+    load_delay_stats,
+    load_delay_sweep,
+    load_feature_store,
+    load_feedback_distribution,
+    load_feedback_store,
+    load_model,
+    load_prediction_cache,
+    load_query_engine,
+    load_reason_index,
+    load_station_graph,
+    load_station_index,
+    load_station_table,
+    load_years,
+    start_warmup,
+)
+
 # --- Configuration de la page ---
 st.set_page_config(
     page_title="TARDIS - Dashboard SNCF",
@@ -12,26 +42,12 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# Instrumentation : durées par étape et compteurs de cache du processus,
+# profil cProfile/tracemalloc du rerun si TARDIS_PROFILE est défini
+rerun_timer = METRICS.start("rerun")
 
-# --- Chargement des données et modèle ---
-@st.cache_data
-def load_data():
-    df = pd.read_csv("cleaned_dataset.csv", sep=";")
-    if "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"])
-        df["month"] = df["date"].dt.month
-        df["year"] = df["date"].dt.year
-        df["hour"] = df["date"].dt.hour
-    return df
-
-
-@st.cache_resource
-def load_model():
-    return joblib.load("tardis_best_model.pkl")
-
-
-df = load_data()
-model = load_model()
+DATA_VERSION = tardis_store.data_version()
+MODEL_VERSION = tardis_predict.model_version()
 
 # --- Sidebar avec navigation et feedback ---
 st.sidebar.title("Navigation")
@@ -39,10 +55,19 @@ pages = [
     "Statistiques des retards",
     "Gares avec plus de retards",
     "Gares les plus fiables",
+    "Causes des retards",
+    "Retards par région",
     "Simulateur de retard",
     "Conseils voyageurs",
 ]
+# Page de diagnostic cachée : ?diagnostics=1 dans l'URL ou TARDIS_DIAGNOSTICS=1
+if (
+    st.query_params.get("diagnostics") == "1"
+    or os.environ.get("TARDIS_DIAGNOSTICS", "0") == "1"
+):
+    pages.append("Diagnostics")
 page = st.sidebar.radio("", pages)
+page_timer = METRICS.start(f"page:{page}")
 
 # Widget de feedback dans la sidebar
 st.sidebar.markdown("---")
@@ -50,28 +75,31 @@ st.sidebar.subheader("Votre avis nous intéresse")
 rating = st.sidebar.slider("Notez ce dashboard (⭐)", 1, 5, 3)
 feedback = st.sidebar.text_input("Commentaire (optionnel)")
 if st.sidebar.button("Envoyer mon avis"):
-    st.sidebar.success("Merci pour votre feedback!")
-    # Ici vous pourriez enregistrer le feedback dans un fichier ou base de données
+    # Mise en file seulement : l'écriture se fait par lots en arrière-plan
+    ctx = get_script_run_ctx()
+    if load_feedback_store().submit(
+        rating, feedback, page=page, session=ctx.session_id if ctx else None
+    ):
+        st.sidebar.success("Merci pour votre feedback!")
+    else:
+        st.sidebar.warning("Trop d'avis en attente, réessayez dans un instant.")
 
 
 # --- Fonctions utilitaires ---
-def group_delay_reasons_by_date(df):
-    date_reasons = defaultdict(list)
-    for _, row in df.dropna(subset=["arrival_delay_comments"]).iterrows():
-        date_str = (
-            row["date"].strftime("%Y-%m-%d")
-            if "date" in df.columns
-            else "Date inconnue"
-        )
-        reasons = [
-            r.strip()
-            for r in str(row["arrival_delay_comments"]).split("\n")
-            if r.strip()
-        ]
-        for reason in reasons:
-            if reason not in date_reasons[date_str]:
-                date_reasons[date_str].append(reason)
-    return date_reasons
+def top_reasons(departure=None, arrival=None, n=3):
+    # Causes les plus fréquentes du trajet filtré
+    if SQL_BACKEND:
+        return load_query_engine(DATA_VERSION).top_reasons(departure, arrival, n)
+    if "arrival_delay_comments" not in df.columns:
+        return pd.Series(dtype="int64")
+    mask = pd.Series(True, index=df.index)
+    if departure is not None:
+        mask &= df["departure_station"] == departure
+    if arrival is not None:
+        mask &= df["arrival_station"] == arrival
+    counts = df.loc[mask, "arrival_delay_comments"].value_counts()
+    # En mode partagé la colonne est catégorielle : causes absentes à 0
+    return counts[counts > 0].head(n)
 
 
 def display_delay_metrics(avg_delay, delay_std, punctuality_rate):
@@ -133,592 +161,567 @@ def display_delay_metrics(avg_delay, delay_std, punctuality_rate):
         )
 
 
-def calculate_reliability_score(delay):
-    if delay <= 2:
-        return 5
-    elif delay <= 5:
-        return 4
-    elif delay <= 10:
-        return 3
-    elif delay <= 15:
-        return 2
-    else:
-        return 1
-
+# Profil du rerun (TARDIS_PROFILE) ; st.rerun() et les erreurs sortent par
+# une exception, les mesures et le profil sont donc arrêtés dans le finally
+rerun_profiler = tardis_metrics.RerunProfiler.from_env(page)
+try:
+    warmup = start_warmup(DATA_VERSION, MODEL_VERSION)
+    df = None if SQL_BACKEND else load_data(DATA_VERSION)
+    model = load_model(MODEL_VERSION)
 
-# --- Page: Statistiques des retards ---
-if page == "Statistiques des retards":
-    st.title("📊 Statistiques des retards par trajet")
-    st.info(
-        "💡 Conseil: Les retards sont généralement plus importants aux heures de pointe (7h-9h et 17h-19h)"
-    )
-
-    # Filtres
-    col1, col2 = st.columns(2)
+    # --- Page: Statistiques des retards ---
+    if page == "Statistiques des retards":
+        st.title("📊 Statistiques des retards par trajet")
+        st.info(
+            "💡 Conseil: Les retards sont généralement plus importants aux heures de pointe (7h-9h et 17h-19h)"
+        )
 
-    # Liste complète de toutes les gares
-    all_departures = ["Toutes"] + sorted(df["departure_station"].dropna().unique())
-    all_arrivals = ["Toutes"] + sorted(df["arrival_station"].dropna().unique())
+        # Filtres
+        col1, col2 = st.columns(2)
 
-    # Initialisation des sélections
-    if "selected_depart" not in st.session_state:
-        st.session_state.selected_depart = "Toutes"
-    if "selected_arrivee" not in st.session_state:
-        st.session_state.selected_arrivee = "Toutes"
+        # Liste complète de toutes les gares (graphe des trajets pré-calculé)
+        station_graph = load_station_graph(DATA_VERSION)
+        all_departures = ["Toutes"] + station_graph.departures
+        all_arrivals = ["Toutes"] + station_graph.arrivals
 
-    # Premier selectbox pour la gare de départ
-    selected_depart = col1.selectbox(
-        "Gare de départ", all_departures, key="depart_select"
-    )
+        # Initialisation des sélections
+        if "selected_depart" not in st.session_state:
+            st.session_state.selected_depart = "Toutes"
+        if "selected_arrivee" not in st.session_state:
+            st.session_state.selected_arrivee = "Toutes"
 
-    # Filtrer les gares d'arrivée possibles en fonction du départ sélectionné
-    if selected_depart != "Toutes":
-        possible_arrivals = ["Toutes"] + sorted(
-            df[df["departure_station"] == selected_depart]["arrival_station"]
-            .dropna()
-            .unique()
+        # Premier selectbox pour la gare de départ
+        selected_depart = col1.selectbox(
+            "Gare de départ", all_departures, key="depart_select"
         )
-    else:
-        possible_arrivals = all_arrivals
 
-    # Deuxième selectbox pour la gare d'arrivée (filtrée)
-    selected_arrivee = col2.selectbox(
-        "Gare d'arrivée", possible_arrivals, key="arrivee_select"
-    )
+        # Filtrer les gares d'arrivée possibles en fonction du départ sélectionné
+        if selected_depart != "Toutes":
+            possible_arrivals = ["Toutes"] + station_graph.possible_arrivals(
+                selected_depart
+            )
+        else:
+            possible_arrivals = all_arrivals
 
-    # Si l'arrivée change, on filtre aussi les départs possibles
-    if selected_arrivee != "Toutes":
-        possible_departures = ["Toutes"] + sorted(
-            df[df["arrival_station"] == selected_arrivee]["departure_station"]
-            .dropna()
-            .unique()
-        )
-        # On met à jour le selectbox des départs si nécessaire
-        if selected_depart != "Toutes" and selected_depart not in possible_departures:
-            selected_depart = "Toutes"
-            st.session_state.selected_depart = "Toutes"
-            st.experimental_rerun()
-    else:
-        possible_departures = all_departures
-
-    # Application des filtres
-    df_filtered = df.copy()
-    if selected_depart != "Toutes":
-        df_filtered = df_filtered[df_filtered["departure_station"] == selected_depart]
-    if selected_arrivee != "Toutes":
-        df_filtered = df_filtered[df_filtered["arrival_station"] == selected_arrivee]
-
-    # KPI
-    if len(df_filtered) > 0:
-        avg_delay = df_filtered["avg_arr_delay"].mean()
-        delay_std = df_filtered["avg_arr_delay"].std()
-        punctuality_rate = (df_filtered["avg_arr_delay"] <= 5).mean() * 100
-
-        display_delay_metrics(avg_delay, delay_std, punctuality_rate)
-
-        # Météo des retards
-        delay_status = (
-            "bonne" if avg_delay < 5 else "moyenne" if avg_delay < 15 else "mauvaise"
+        # Deuxième selectbox pour la gare d'arrivée (filtrée)
+        selected_arrivee = col2.selectbox(
+            "Gare d'arrivée", possible_arrivals, key="arrivee_select"
         )
-        st.subheader(f"Situation actuelle: {delay_status.capitalize()}")
-        if delay_status == "mauvaise":
-            st.warning("Privilégiez les transports alternatifs aujourd'hui")
 
-        # Top 3 des raisons de retard
-        if "arrival_delay_comments" in df_filtered.columns:
-            reasons = df_filtered["arrival_delay_comments"].value_counts().head(3)
+        # Si l'arrivée change, on filtre aussi les départs possibles
+        if selected_arrivee != "Toutes":
+            possible_departures = ["Toutes"] + station_graph.possible_departures(
+                selected_arrivee
+            )
+            # On met à jour le selectbox des départs si nécessaire
+            if selected_depart != "Toutes" and selected_depart not in possible_departures:
+                selected_depart = "Toutes"
+                st.session_state.selected_depart = "Toutes"
+                st.rerun()
+        else:
+            possible_departures = all_departures
+
+        # Application des filtres (KPI lus dans le cube d'agrégats, ou requête
+        # filtrée sur le trajet en mode SQL)
+        depart_filter = None if selected_depart == "Toutes" else selected_depart
+        arrivee_filter = None if selected_arrivee == "Toutes" else selected_arrivee
+        with METRICS.stage("stats:delay_stats"):
+            stats = load_delay_stats(DATA_VERSION, depart_filter, arrivee_filter)
+
+        # KPI
+        if stats is not None:
+            avg_delay, delay_std, punctuality_rate = stats
+
+            display_delay_metrics(avg_delay, delay_std, punctuality_rate)
+
+            # Météo des retards
+            delay_status = (
+                "bonne" if avg_delay < 5 else "moyenne" if avg_delay < 15 else "mauvaise"
+            )
+            st.subheader(f"Situation actuelle: {delay_status.capitalize()}")
+            if delay_status == "mauvaise":
+                st.warning("Privilégiez les transports alternatifs aujourd'hui")
+
+            # Top 3 des raisons de retard
+            with METRICS.stage("stats:top_reasons"):
+                reasons = top_reasons(depart_filter, arrivee_filter)
             if len(reasons) > 0:
                 st.subheader("🔍 Top 3 des causes de retard")
                 for reason, count in reasons.items():
                     st.write(f"- {reason} ({count} occurrences)")
-    else:
-        st.warning("Aucune donnée disponible pour cette sélection de gares.")
-
-# --- Page: Gares avec plus de retards ---
-elif page == "Gares avec plus de retards":
-    st.title("⚠️ Gares avec les plus gros retards")
-
-    # Filtre par année si disponible
-    year_filter = "Toutes"
-    if "year" in df.columns:
-        years = ["Toutes"] + sorted(df["year"].unique())
-        year_filter = st.selectbox("Filtrer par année", years)
-
-    # Calcul des classements
-    df_ranking = df.copy()
-    if year_filter != "Toutes":
-        df_ranking = df_ranking[df_ranking["year"] == year_filter]
-
-    top_departure = (
-        df_ranking.groupby("departure_station")["avg_dep_delay"]
-        .mean()
-        .sort_values(ascending=False)
-        .head(10)
-        .reset_index()
-        .rename(
-            columns={"departure_station": "Gare", "avg_dep_delay": "Retard moyen (min)"}
+        else:
+            st.warning("Aucune donnée disponible pour cette sélection de gares.")
+
+    # --- Page: Gares avec plus de retards ---
+    elif page == "Gares avec plus de retards":
+        st.title("⚠️ Gares avec les plus gros retards")
+
+        # Filtre par année si disponible
+        year_filter = "Toutes"
+        years = load_years(DATA_VERSION)
+        if years:
+            year_filter = st.selectbox("Filtrer par année", ["Toutes"] + years)
+
+        top_n = st.selectbox("Nombre de gares", tardis_render.TOP_N_OPTIONS)
+
+        # Classements calculés à partir du cube (gare, année), rendus en un
+        # fragment HTML par liste
+        ranking_year = None if year_filter == "Toutes" else year_filter
+        departure_cards, arrival_cards = load_card_fragments(
+            page, ranking_year, DATA_VERSION, top_n
         )
-    )
 
-    top_arrival = (
-        df_ranking.groupby("arrival_station")["avg_arr_delay"]
-        .mean()
-        .sort_values(ascending=False)
-        .head(10)
-        .reset_index()
-        .rename(
-            columns={"arrival_station": "Gare", "avg_arr_delay": "Retard moyen (min)"}
-        )
-    )
+        # Affichage des classements
+        col1, col2 = st.columns(2)
 
-    # Style CSS amélioré
-    st.markdown(
-        """
-    <style>
-        .card {
-            border-radius: 10px;
-            padding: 15px;
-            margin: 10px 0;
-            box-shadow: 0 4px 8px 0 rgba(0,0,0,0.2);
-            transition: 0.3s;
-            display: flex;
-            flex-direction: column;
-        }
-        .card:hover {
-            box-shadow: 0 8px 16px 0 rgba(0,0,0,0.2);
-        }
-        .card-header {
-            display: flex;
-            align-items: center;
-            margin-bottom: 10px;
-        }
-        .gold {
-            background-color: #FFF9C4;
-            border-left: 5px solid #FFD700;
-        }
-        .silver {
-            background-color: #F5F5F5;
-            border-left: 5px solid #C0C0C0;
-        }
-        .bronze {
-            background-color: #FFECB3;
-            border-left: 5px solid #CD7F32;
-        }
-        .other {
-            background-color: #E3F2FD;
-            border-left: 5px solid #64B5F6;
-        }
-        .rank-1 {
-            font-size: 2.5rem;
-            font-weight: 900;
-            color: #FFD700;
-            margin-right: 15px;
-        }
-        .rank-2 {
-            font-size: 2.2rem;
-            font-weight: 700;
-            color: #C0C0C0;
-            margin-right: 15px;
-        }
-        .rank-3 {
-            font-size: 2rem;
-            font-weight: 600;
-            color: #CD7F32;
-            margin-right: 15px;
-        }
-        .rank-4 {
-            font-size: 1.8rem;
-            font-weight: 500;
-            color: #000000;
-            margin-right: 15px;
-        }
-        .station-name {
-            font-size: 1.5rem;
-            font-weight: bold;
-            color: #000000;
-        }
-        .delay-value {
-            font-size: 1.2rem;
-            color: #333;
-            margin-top: auto;
-            align-self: flex-start;
-        }
-    </style>
-    """,
-        unsafe_allow_html=True,
-    )
+        with METRICS.stage("render:ranking_cards"):
+            with col1:
+                st.subheader(f"Top {top_n} départs")
+                st.markdown(
+                    tardis_render.stylesheet(tardis_render.RANKING_CSS) + departure_cards,
+                    unsafe_allow_html=True,
+                )
 
-    # Affichage des classements
-    col1, col2 = st.columns(2)
+            with col2:
+                st.subheader(f"Top {top_n} arrivées")
+                st.markdown(arrival_cards, unsafe_allow_html=True)
 
-    with col1:
-        st.subheader("Top 10 départs")
-        for i, row in top_departure.iterrows():
-            rank_class = f"rank-{i + 1}" if i < 4 else "rank-4"
-            card_class = (
-                "gold"
-                if i == 0
-                else "silver"
-                if i == 1
-                else "bronze"
-                if i == 2
-                else "other"
-            )
+    # --- Page: Gares les plus fiables ---
+    elif page == "Gares les plus fiables":
+        st.title("⭐ Gares les plus fiables")
 
-            st.markdown(
-                f"""
-                <div class="card {card_class}">
-                    <div class="card-header">
-                        <div class="{rank_class}">{i + 1}</div>
-                        <div class="station-name">{row["Gare"]}</div>
-                    </div>
-                    <div class="delay-value">Retard moyen: {row["Retard moyen (min)"]:.1f} min</div>
-                </div>
-                """,
-                unsafe_allow_html=True,
-            )
+        # Filtre par année si disponible
+        year_filter = "Toutes"
+        years = load_years(DATA_VERSION)
+        if years:
+            year_filter = st.selectbox("Filtrer par année", ["Toutes"] + years)
 
-    with col2:
-        st.subheader("Top 10 arrivées")
-        for i, row in top_arrival.iterrows():
-            rank_class = f"rank-{i + 1}" if i < 4 else "rank-4"
-            card_class = (
-                "gold"
-                if i == 0
-                else "silver"
-                if i == 1
-                else "bronze"
-                if i == 2
-                else "other"
-            )
+        top_n = st.selectbox("Nombre de gares", tardis_render.TOP_N_OPTIONS)
 
+        # Fiabilité calculée à partir du cube (gare, année), rendue en un
+        # fragment HTML par liste
+        reliability_year = None if year_filter == "Toutes" else year_filter
+        departure_cards, arrival_cards = load_card_fragments(
+            page, reliability_year, DATA_VERSION, top_n
+        )
+
+        # Affichage des résultats
+        with METRICS.stage("render:reliability_cards"):
+            st.subheader(f"🚂 Top {top_n} des gares de départ les plus fiables")
             st.markdown(
-                f"""
-                <div class="card {card_class}">
-                    <div class="card-header">
-                        <div class="{rank_class}">{i + 1}</div>
-                        <div class="station-name">{row["Gare"]}</div>
-                    </div>
-                    <div class="delay-value">Retard moyen: {row["Retard moyen (min)"]:.1f} min</div>
-                </div>
-                """,
+                tardis_render.stylesheet(tardis_render.RELIABILITY_CSS) + departure_cards,
                 unsafe_allow_html=True,
             )
 
-# --- Page: Gares les plus fiables ---
-elif page == "Gares les plus fiables":
-    st.title("⭐ Gares les plus fiables")
-
-    # Filtre par année si disponible
-    year_filter = "Toutes"
-    if "year" in df.columns:
-        years = ["Toutes"] + sorted(df["year"].unique())
-        year_filter = st.selectbox("Filtrer par année", years)
-
-    # Calcul de la fiabilité
-    df_reliability = df.copy()
-    if year_filter != "Toutes":
-        df_reliability = df_reliability[df_reliability["year"] == year_filter]
-
-    # Calcul pour les gares de départ
-    departure_reliability = (
-        df_reliability.groupby("departure_station")["avg_dep_delay"]
-        .mean()
-        .reset_index()
-        .rename(
-            columns={"departure_station": "Gare", "avg_dep_delay": "Retard moyen (min)"}
-        )
-    )
-    departure_reliability["Fiabilité"] = departure_reliability[
-        "Retard moyen (min)"
-    ].apply(calculate_reliability_score)
-
-    # Calcul pour les gares d'arrivée
-    arrival_reliability = (
-        df_reliability.groupby("arrival_station")["avg_arr_delay"]
-        .mean()
-        .reset_index()
-        .rename(
-            columns={"arrival_station": "Gare", "avg_arr_delay": "Retard moyen (min)"}
-        )
-    )
-    arrival_reliability["Fiabilité"] = arrival_reliability["Retard moyen (min)"].apply(
-        calculate_reliability_score
-    )
-
-    # Top 10 des gares les plus fiables (départ)
-    top_reliable_departure = departure_reliability.sort_values(
-        "Fiabilité", ascending=False
-    ).head(10)
-
-    # Top 10 des gares les plus fiables (arrivée)
-    top_reliable_arrival = arrival_reliability.sort_values(
-        "Fiabilité", ascending=False
-    ).head(10)
-
-    # Style CSS pour les cartes de fiabilité
-    st.markdown(
-        """
-    <style>
-        .reliability-card {
-            border-radius: 10px;
-            padding: 20px;
-            margin: 10px 0;
-            box-shadow: 0 4px 8px 0 rgba(0,0,0,0.1);
-            background-color: #f8f9fa;
-            border-left: 5px solid #4CAF50;
-            display: flex;
-            flex-direction: column;
-            min-height: 140px;
-        }
-        .reliability-header {
-            display: flex;
-            align-items: center;
-            margin-bottom: 15px;
-        }
-        .reliability-stars {
-            font-size: 2rem;
-            color: #FFD700;
-            margin-right: 20px;
-        }
-        .reliability-station {
-            font-weight: bold;
-            font-size: 2rem;
-            color: #2c3e50;
-            line-height: 1.2;
-        }
-        .reliability-delay {
-            font-size: 1.4rem;
-            color: #7f8c8d;
-            margin-top: auto;
-            align-self: flex-start;
-        }
-        .reliability-columns {
-            display: grid;
-            grid-template-columns: repeat(2, 1fr);
-            gap: 20px;
-        }
-        @media (max-width: 768px) {
-            .reliability-columns {
-                grid-template-columns: 1fr;
-            }
-            .reliability-station {
-                font-size: 1.8rem;
-            }
-            .reliability-stars {
-                font-size: 1.8rem;
-            }
-            .reliability-delay {
-                font-size: 1.2rem;
-            }
-        }
-    </style>
-    """,
-        unsafe_allow_html=True,
-    )
+            st.subheader(f"🚉 Top {top_n} des gares d'arrivée les plus fiables")
+            st.markdown(arrival_cards, unsafe_allow_html=True)
+
+        # Légende, construite à partir des bornes configurées
+        labels = ["Exceptionnel", "Très fiable", "Fiable", "Moyen", "Peu fiable"]
+        levels = len(RELIABILITY_THRESHOLDS) + 1
+        legend = ["**Légende:**"]
+        for i, threshold in enumerate(RELIABILITY_THRESHOLDS + [None]):
+            stars = "⭐" * (levels - i) + "☆" * i
+            label = labels[i] if len(labels) == levels else f"{levels - i} étoiles"
+            if threshold is None:
+                legend.append(
+                    f"- {stars} : {label} (retard moyen > {RELIABILITY_THRESHOLDS[-1]:g} min)"
+                )
+            else:
+                legend.append(f"- {stars} : {label} (retard moyen ≤ {threshold:g} min)")
+        st.markdown("\n".join(legend))
+
+    # --- Page: Causes des retards ---
+    elif page == "Causes des retards":
+        st.title("🔍 Causes des retards")
+
+        reason_index, reason_slices = load_reason_index(DATA_VERSION)
+        if not reason_slices:
+            st.warning("Aucun commentaire de retard disponible.")
+        else:
+            # Causes triées par nombre d'occurrences, filtrées par recherche
+            search = st.text_input("Rechercher une cause").strip().lower()
+            reasons = [r for r in reason_slices if search in r.lower()]
+
+            if not reasons:
+                st.warning("Aucune cause ne correspond à cette recherche.")
+            else:
+                selected_reason = st.selectbox("Cause", reasons)
+                occurrences = tardis_reasons.reason_occurrences(
+                    reason_index, reason_slices, selected_reason
+                )
 
-    # Affichage des résultats
-    st.subheader("🚂 Top 10 des gares de départ les plus fiables")
+                st.subheader(
+                    f"{len(occurrences)} trajets concernés sur "
+                    f"{occurrences['date'].nunique()} dates"
+                )
+                st.dataframe(
+                    occurrences.drop(columns="reason").rename(
+                        columns={
+                            "date": "Date",
+                            "departure_station": "Gare de départ",
+                            "arrival_station": "Gare d'arrivée",
+                        }
+                    ),
+                    hide_index=True,
+                )
 
-    st.markdown('<div class="reliability-columns">', unsafe_allow_html=True)
-    for i, row in top_reliable_departure.iterrows():
-        stars = "⭐" * row["Fiabilité"]
-        st.markdown(
-            f"""
-        <div class="reliability-card">
-            <div class="reliability-header">
-                <div class="reliability-stars">{stars}</div>
-                <div class="reliability-station">{row["Gare"]}</div>
-            </div>
-            <div class="reliability-delay">Retard moyen: {row["Retard moyen (min)"]:.1f} min</div>
-        </div>
-        """,
-            unsafe_allow_html=True,
-        )
-    st.markdown("</div>", unsafe_allow_html=True)
+    # --- Page: Retards par région ---
+    elif page == "Retards par région":
+        st.title("🗺️ Retards par région")
+
+        station_index = load_station_index(DATA_VERSION)
+        if not len(station_index):
+            st.warning("Aucune gare du dataset n'a de coordonnées.")
+        else:
+            col1, col2, col3 = st.columns(3)
+            direction = col1.radio("Gares", ["Départ", "Arrivée"], horizontal=True)
+            station_col, prefix = (
+                ("departure_station", "dep")
+                if direction == "Départ"
+                else ("arrival_station", "arr")
+            )
+            years = load_years(DATA_VERSION)
+            selected_year = col2.selectbox("Année", ["Toutes"] + years)
+            year = None if selected_year == "Toutes" else selected_year
+            table = load_station_table(DATA_VERSION, station_col, year)
+            mode = col3.radio("Zone", ["Autour d'une gare", "Département"], horizontal=True)
+
+            if mode == "Autour d'une gare":
+                col1, col2 = st.columns(2)
+                hub = col1.selectbox("Gare centrale", list(station_index.stations))
+                radius_km = col2.slider("Rayon (km)", 10, 300, 50, step=10)
+                zone = station_index.within_radius(radius_km, station=hub)
+                zone_name = f"{hub} ({radius_km} km)"
+            else:
+                department = st.selectbox("Département", list(station_index.by_department))
+                zone = station_index.in_department(department)
+                zone_name = department
+
+            with METRICS.stage("region:zone_means"):
+                stats = tardis_aggregates.zone_means(
+                    table, station_col, prefix, {zone_name: zone["station"].tolist()}, year
+                ).iloc[0]
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Gares de la zone avec des données", int(stats["stations"]))
+            col2.metric(
+                "Retard moyen",
+                "—" if pd.isna(stats["mean"]) else f"{stats['mean']:.2f} min",
+            )
+            col3.metric(
+                "Taux de ponctualité",
+                "—" if pd.isna(stats["punctuality"]) else f"{stats['punctuality']:.1f}%",
+            )
 
-    st.subheader("🚉 Top 10 des gares d'arrivée les plus fiables")
+            # Retard moyen de chaque gare de la zone (lookup dans les moyennes par gare)
+            means = tardis_aggregates.station_means(table, station_col, prefix, year)
+            zone = zone.assign(delay=zone["station"].map(means)).dropna(subset=["delay"])
+            if zone.empty:
+                st.info("Aucune donnée de retard pour cette zone.")
+            else:
+                st.map(zone, latitude="lat", longitude="lon", size=3000)
+                columns = ["station", "department", "distance_km", "delay"]
+                if mode == "Département":
+                    columns.remove("distance_km")
+                st.dataframe(
+                    zone.sort_values("delay", ascending=False)[columns].rename(
+                        columns={
+                            "station": "Gare",
+                            "department": "Département",
+                            "distance_km": "Distance (km)",
+                            "delay": "Retard moyen (min)",
+                        }
+                    ),
+                    hide_index=True,
+                )
 
-    st.markdown('<div class="reliability-columns">', unsafe_allow_html=True)
-    for i, row in top_reliable_arrival.iterrows():
-        stars = "⭐" * row["Fiabilité"]
-        st.markdown(
-            f"""
-        <div class="reliability-card">
-            <div class="reliability-header">
-                <div class="reliability-stars">{stars}</div>
-                <div class="reliability-station">{row["Gare"]}</div>
-            </div>
-            <div class="reliability-delay">Retard moyen: {row["Retard moyen (min)"]:.1f} min</div>
-        </div>
-        """,
-            unsafe_allow_html=True,
-        )
-    st.markdown("</div>", unsafe_allow_html=True)
-
-    # Légende
-    st.markdown("""
-    **Légende:**
-    - ⭐⭐⭐⭐⭐ : Exceptionnel (retard moyen ≤ 2 min)
-    - ⭐⭐⭐⭐☆ : Très fiable (retard moyen ≤ 5 min)
-    - ⭐⭐⭐☆☆ : Fiable (retard moyen ≤ 10 min)
-    - ⭐⭐☆☆☆ : Moyen (retard moyen ≤ 15 min)
-    - ⭐☆☆☆☆ : Peu fiable (retard moyen > 15 min)
-    """)
-elif page == "Simulateur de retard":
-    st.title("🔮 Simulateur de retard à l'arrivée")
-
-    with st.form("prediction_form"):
-        col1, col2 = st.columns(2)
+            # Zones les plus en retard autour des gares les plus fréquentées
+            st.subheader("🔥 Zones les plus en retard autour des grands hubs")
+            hub_radius = st.slider("Rayon autour des hubs (km)", 10, 300, 100, step=10)
+            # Hubs choisis sur toutes les années, quel que soit le filtre
+            traffic = (
+                load_station_table(DATA_VERSION, station_col)
+                .groupby(station_col, observed=True)["rows"]
+                .sum()
+            )
+            hubs = [str(h) for h in traffic.sort_values(ascending=False).index[:15]]
+            clusters = tardis_aggregates.zone_means(
+                table,
+                station_col,
+                prefix,
+                station_index.hub_neighbourhoods(hubs, hub_radius),
+                year,
+            )
+            st.dataframe(
+                clusters.dropna(subset=["mean"])
+                .sort_values("mean", ascending=False)
+                .reset_index()
+                .rename(
+                    columns={
+                        "zone": "Hub",
+                        "mean": "Retard moyen (min)",
+                        "punctuality": "Ponctualité (%)",
+                        "stations": "Gares",
+                        "rows": "Trajets-mois",
+                    }
+                ),
+                hide_index=True,
+            )
 
-        # Paramètres simplifiés
-        departure_station = col1.selectbox(
-            "Gare de départ *", sorted(df["departure_station"].unique())
-        )
+    # --- Page: Simulateur de retard ---
+    elif page == "Simulateur de retard":
+        st.title("🔮 Simulateur de retard à l'arrivée")
 
-        arrival_station = col2.selectbox(
-            "Gare d'arrivée *", sorted(df["arrival_station"].unique())
+        sweep = (
+            st.radio(
+                "Mode",
+                ["Estimation ponctuelle", "Balayage du trajet (0-120 min × 12 mois)"],
+                horizontal=True,
+            )
+            != "Estimation ponctuelle"
         )
 
-        month = col1.selectbox(
-            "Mois *",
-            range(1, 13),
-            format_func=lambda x: datetime(2023, x, 1).strftime("%B"),
-        )
+        with st.form("prediction_form"):
+            col1, col2 = st.columns(2)
 
-        avg_dep_delay = col2.number_input(
-            "Retard initial au départ (minutes) *",
-            min_value=0.0,
-            max_value=120.0,
-            value=5.0,
-            step=1.0,
-        )
+            # Paramètres simplifiés
+            station_graph = load_station_graph(DATA_VERSION)
+            departure_station = col1.selectbox(
+                "Gare de départ *", station_graph.departures
+            )
 
-        submitted = st.form_submit_button("Estimer le retard")
-
-        if submitted:
-            # Construction de la route et calcul des features dérivées
-            route = f"{departure_station} ➜ {arrival_station}"
-            quarter = (month - 1) // 3 + 1
-            major_stations = df["arrival_station"].value_counts().head(10).index
-            is_major_arrival = 1 if arrival_station in major_stations else 0
-
-            # Filtrage historique pour la ligne sélectionnée
-            df_route = df[
-                (df["departure_station"] == departure_station)
-                & (df["arrival_station"] == arrival_station)
-                & (df["month"] == month)
-            ]
-
-            # Calcul de delay_ratio avec moyenne agrégée (float)
-            if not df_route.empty:
-                delay_ratio = (df_route["avg_arr_delay"] / (df_route["avg_dep_delay"] + 0.1)).mean()
-            else:
-                delay_ratio = 0.2  # valeur par défaut
-
-            # Préparation des features pour le modèle
-            X_input = pd.DataFrame(
-                {
-                    "route": [route],
-                    "avg_dep_delay": [avg_dep_delay],
-                    "total_delay_points": [0],
-                    "trains_delayed_15min": [0],
-                    "trains_delayed_30min": [0],
-                    "trains_delayed_60min": [0],
-                    "month": [month],
-                    "quarter": [quarter],
-                    "is_major_arrival": [is_major_arrival],
-                    "pct_delay_external": [0.1],
-                    "delay_ratio": [delay_ratio],
-                    "cancelled_trains": [0],
-                }
+            arrival_station = col2.selectbox(
+                "Gare d'arrivée *", station_graph.arrivals
             )
 
-            try:
-                prediction = max(0, model.predict(X_input)[0])
+            month = col1.selectbox(
+                "Mois *",
+                range(1, 13),
+                format_func=lambda x: datetime(2023, x, 1).strftime("%B"),
+            )
 
-                # Affichage du résultat
-                delay_level = (
-                    "faible"
-                    if prediction < 5
-                    else "modéré"
-                    if prediction < 15
-                    else "important"
-                )
-                delay_color = (
-                    "#28a745"
-                    if prediction < 5
-                    else "#ffc107"
-                    if prediction < 15
-                    else "#dc3545"
+            if not sweep:
+                avg_dep_delay = col2.number_input(
+                    "Retard initial au départ (minutes) *",
+                    min_value=0.0,
+                    max_value=120.0,
+                    value=5.0,
+                    step=1.0,
                 )
 
-                st.markdown(
-                    f"""
-                    <div style='border: 2px solid {delay_color}; border-radius: 10px; padding: 20px; margin: 20px 0;'>
-                        <h3 style='color: {delay_color}; text-align: center;'>Retard estimé: {prediction:.1f} minutes</h3>
-                        <p style='text-align: center;'>Niveau de retard: <strong>{delay_level}</strong></p>
-                    </div>
-                    """,
-                    unsafe_allow_html=True,
-                )
+            submitted = st.form_submit_button(
+                "Explorer le trajet" if sweep else "Estimer le retard"
+            )
 
-                # Conseils personnalisés
-                st.subheader("Conseils pour votre voyage")
-                if prediction >= 15:
-                    st.error("**Retard important prévu**")
-                    st.markdown("""
-                        - Prévoyez au moins 30 minutes de marge supplémentaire
-                        - Évitez les rendez-vous importants juste après votre arrivée
-                        - Vérifiez les alternatives de transport avant de partir
-                    """)
-                elif prediction >= 5:
-                    st.warning("**Retard modéré prévu**")
-                    st.markdown("""
-                        - Prévoyez 15-20 minutes de marge
-                        - Surveillez les informations en temps réel pendant votre voyage
-                        - Identifiez les correspondances alternatives en gare
-                    """)
+            if submitted and sweep:
+                # Toute la grille en une inférence, mise en cache par trajet
+                try:
+                    with METRICS.stage("predict:sweep"):
+                        sweep_table = load_delay_sweep(
+                            departure_station, arrival_station, DATA_VERSION, MODEL_VERSION
+                        )
+                except Exception as e:
+                    st.error(f"Erreur lors de la prédiction : {str(e)}")
                 else:
-                    st.success("**Retard minime prévu**")
-                    st.markdown("""
-                        - Votre trajet devrait se dérouler normalement
-                        - Une marge de 5-10 minutes est suffisante
-                        - Bon voyage !
-                    """)
-
-            except Exception as e:
-                st.error(f"Erreur lors de la prédiction : {str(e)}")
-                st.info(
-                    "Assurez-vous que toutes les informations sont correctement renseignées"
-                )
+                    month_names = {
+                        m: datetime(2023, m, 1).strftime("%B") for m in sweep_table.columns
+                    }
+                    st.subheader(f"Retard estimé à l'arrivée en {month_names[month]}")
+                    st.line_chart(
+                        sweep_table[month].rename("Retard estimé (min)"),
+                        x_label="Retard au départ (min)",
+                        y_label="Retard estimé à l'arrivée (min)",
+                    )
+
+                    st.subheader("Retard estimé selon le mois et le retard au départ")
+                    heatmap = (
+                        sweep_table.rename(columns=month_names)
+                        .melt(ignore_index=False, var_name="Mois", value_name="Retard estimé")
+                        .reset_index()
+                    )
+                    st.altair_chart(
+                        alt.Chart(heatmap)
+                        .mark_rect()
+                        .encode(
+                            x=alt.X("Mois:O", sort=list(month_names.values())),
+                            y=alt.Y(
+                                "avg_dep_delay:O",
+                                title="Retard au départ (min)",
+                                sort="descending",
+                            ),
+                            color=alt.Color(
+                                "Retard estimé:Q", scale=alt.Scale(scheme="orangered")
+                            ),
+                            tooltip=[
+                                "Mois",
+                                "avg_dep_delay",
+                                alt.Tooltip("Retard estimé:Q", format=".1f"),
+                            ],
+                        ),
+                        use_container_width=True,
+                    )
+
+            if submitted and not sweep:
+                # Features dérivées lues dans le magasin pré-calculé (gares
+                # majeures, delay_ratio moyen du trajet pour ce mois)
+                # Les prédictions déjà calculées sont servies par le cache LRU
+                feature_store = load_feature_store(DATA_VERSION)
+                prediction_cache = load_prediction_cache(DATA_VERSION)
+
+                try:
+                    with METRICS.stage("predict"):
+                        prediction = prediction_cache.predict(
+                            model,
+                            MODEL_VERSION,
+                            feature_store,
+                            departure_station,
+                            arrival_station,
+                            month,
+                            avg_dep_delay,
+                        )
+
+                    # Affichage du résultat
+                    delay_level = (
+                        "faible"
+                        if prediction < 5
+                        else "modéré"
+                        if prediction < 15
+                        else "important"
+                    )
+                    delay_color = (
+                        "#28a745"
+                        if prediction < 5
+                        else "#ffc107"
+                        if prediction < 15
+                        else "#dc3545"
+                    )
+
+                    st.markdown(
+                        f"""
+                        <div style='border: 2px solid {delay_color}; border-radius: 10px; padding: 20px; margin: 20px 0;'>
+                            <h3 style='color: {delay_color}; text-align: center;'>Retard estimé: {prediction:.1f} minutes</h3>
+                            <p style='text-align: center;'>Niveau de retard: <strong>{delay_level}</strong></p>
+                        </div>
+                        """,
+                        unsafe_allow_html=True,
+                    )
+
+                    # Conseils personnalisés
+                    st.subheader("Conseils pour votre voyage")
+                    if prediction >= 15:
+                        st.error("**Retard important prévu**")
+                        st.markdown("""
+                            - Prévoyez au moins 30 minutes de marge supplémentaire
+                            - Évitez les rendez-vous importants juste après votre arrivée
+                            - Vérifiez les alternatives de transport avant de partir
+                        """)
+                    elif prediction >= 5:
+                        st.warning("**Retard modéré prévu**")
+                        st.markdown("""
+                            - Prévoyez 15-20 minutes de marge
+                            - Surveillez les informations en temps réel pendant votre voyage
+                            - Identifiez les correspondances alternatives en gare
+                        """)
+                    else:
+                        st.success("**Retard minime prévu**")
+                        st.markdown("""
+                            - Votre trajet devrait se dérouler normalement
+                            - Une marge de 5-10 minutes est suffisante
+                            - Bon voyage !
+                        """)
+
+                except Exception as e:
+                    st.error(f"Erreur lors de la prédiction : {str(e)}")
+                    st.info(
+                        "Assurez-vous que toutes les informations sont correctement renseignées"
+                    )
+
+    # --- Page: Conseils voyageurs ---
+    elif page == "Conseils voyageurs":
+        st.title("💡 Conseils pour éviter les retards")
+
+        st.header("📌 Choisir le bon créneau")
+        st.write("""
+        - **Meilleurs horaires** : Privilégiez les trains avant 7h ou entre 10h et 16h
+        - **À éviter** : Les heures de pointe (8h-9h et 17h-19h) sont plus sujettes aux retards
+        """)
+
+        st.header("🚄 Choisir le bon trajet")
+        st.write("""
+        - **Trajets directs** : Moins de risques de retard que les trajets avec correspondance
+        - **Gares majeures** : Les grandes gares ont souvent moins de retards que les petites
+        """)
+
+        st.header("⏱ Gérer les retards")
+        st.write("""
+        - **Marge de sécurité** : Prévoyez toujours 15-30 minutes de marge pour vos rendez-vous
+        - **Applications utiles** : Téléchargez l'application SNCF pour les alertes en temps réel
+        - **Droits voyageurs** : En cas de retard important, vous pouvez être éligible à une compensation
+        """)
+
+        st.header("🚆 Alternatives")
+        st.write("""
+        - **Transports alternatifs** : Bus, covoiturage ou TER peuvent être plus fiables selon les trajets
+        - **Horaires flexibles** : Si possible, choisissez des billets modifiables sans frais
+        """)
+
+    # --- Page cachée: Diagnostics ---
+    elif page == "Diagnostics":
+        st.title("🩺 Diagnostics du processus")
+        st.caption(
+            f"Données {DATA_VERSION} ({'DuckDB' if SQL_BACKEND else 'pandas'}) · "
+            f"modèle {MODEL_VERSION} · "
+            f"fenêtre de {tardis_metrics.STAGE_WINDOW} mesures par étape"
+        )
 
+        st.subheader("Durées par étape (ms)")
+        st.dataframe(METRICS.stage_table().round(2), hide_index=True)
 
-# --- Page: Conseils voyageurs ---
-elif page == "Conseils voyageurs":
-    st.title("💡 Conseils pour éviter les retards")
-
-    st.header("📌 Choisir le bon créneau")
-    st.write("""
-    - **Meilleurs horaires** : Privilégiez les trains avant 7h ou entre 10h et 16h
-    - **À éviter** : Les heures de pointe (8h-9h et 17h-19h) sont plus sujettes aux retards
-    """)
-
-    st.header("🚄 Choisir le bon trajet")
-    st.write("""
-    - **Trajets directs** : Moins de risques de retard que les trajets avec correspondance
-    - **Gares majeures** : Les grandes gares ont souvent moins de retards que les petites
-    """)
-
-    st.header("⏱ Gérer les retards")
-    st.write("""
-    - **Marge de sécurité** : Prévoyez toujours 15-30 minutes de marge pour vos rendez-vous
-    - **Applications utiles** : Téléchargez l'application SNCF pour les alertes en temps réel
-    - **Droits voyageurs** : En cas de retard important, vous pouvez être éligible à une compensation
-    """)
-
-    st.header("🚆 Alternatives")
-    st.write("""
-    - **Transports alternatifs** : Bus, covoiturage ou TER peuvent être plus fiables selon les trajets
-    - **Horaires flexibles** : Si possible, choisissez des billets modifiables sans frais
-    """)
+        st.subheader("Préchauffage")
+        if warmup.ready:
+            st.success(f"Prêt : préchauffage terminé en {warmup.elapsed:.2f} s")
+        else:
+            st.info("Préchauffage en cours")
+        st.dataframe(warmup.status_table().round(3), hide_index=True)
+
+        st.subheader("Caches Streamlit")
+        st.dataframe(METRICS.cache_table().round(3), hide_index=True)
+
+        st.subheader("Cache des prédictions du simulateur")
+        st.json(load_prediction_cache(DATA_VERSION).stats())
+
+        st.subheader("Avis des utilisateurs")
+        feedback_store = load_feedback_store()
+        feedback_version = feedback_store.version()
+        col1, col2 = st.columns(2)
+        col1.caption("Notes par page")
+        col1.dataframe(
+            load_feedback_distribution("page", feedback_version).round(2), hide_index=True
+        )
+        col2.caption("Notes par jour")
+        col2.dataframe(
+            load_feedback_distribution("day", feedback_version).round(2), hide_index=True
+        )
+        st.json(feedback_store.stats())
+
+        st.subheader("Profils des derniers reruns")
+        if not METRICS.profiles:
+            st.info(
+                "Profilage inactif : lancez le dashboard avec "
+                "TARDIS_PROFILE=cprofile,tracemalloc"
+            )
+        for report in reversed(METRICS.profiles):
+            with st.expander(f"{report['time']} · {report['label']}"):
+                for mode in tardis_metrics.REPORT_SECTIONS:
+                    if mode in report:
+                        st.code(report[mode], language="text")
+
+        if st.button("Réinitialiser les mesures"):
+            METRICS.reset()
+            st.rerun()
+finally:
+    # --- Fin du rerun : durées de la page et profil éventuel ---
+    page_timer.stop()
+    rerun_timer.stop()
+    if rerun_profiler is not None:
+        rerun_profiler.stop()
@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+
+# --- Features du modèle de prédiction ---
+# Définitions partagées entre tardis_model.ipynb (entraînement) et le
+# simulateur du dashboard, plus un magasin de features pré-calculé une fois
+# par version des données : la prédiction se réduit à des lookups.
+
+MODEL_FEATURES = [
+    "route",
+    "avg_dep_delay",
+    "total_delay_points",
+    "trains_delayed_30min",
+    "trains_delayed_60min",
+    "trains_delayed_15min",
+    "cancelled_trains",
+    "month",
+    "delay_ratio",
+    "quarter",
+    "is_major_arrival",
+    "pct_delay_external",
+]
+
+MAJOR_ARRIVALS_COUNT = 10
+
+# Valeurs fixes utilisées par le simulateur pour les features inconnues a priori
+SIMULATOR_DEFAULTS = {
+    "total_delay_points": 0,
+    "trains_delayed_15min": 0,
+    "trains_delayed_30min": 0,
+    "trains_delayed_60min": 0,
+    "pct_delay_external": 0.1,
+    "cancelled_trains": 0,
+}
+
+# Dernier recours si aucun historique n'est disponible
+DEFAULT_DELAY_RATIO = 0.2
+
+
+def make_route(departure_station, arrival_station):
+    return f"{departure_station} ➜ {arrival_station}"
+
+
+def month_quarter(month):
+    return (month - 1) // 3 + 1
+
+
+def delay_ratio(df):
+    return df["avg_arr_delay"] / (df["avg_dep_delay"] + 0.1)
+
+
+def major_arrivals(df):
+    return df["arrival_station"].value_counts().head(MAJOR_ARRIVALS_COUNT).index
+
+
+def add_model_features(df):
+    df["total_delay_points"] = (
+        df["trains_delayed_15min"]
+        + 2 * df["trains_delayed_30min"]
+        + 4 * df["trains_delayed_60min"]
+    )
+    df["quarter"] = pd.to_datetime(df["date"]).dt.quarter
+    df["is_major_arrival"] = df["arrival_station"].isin(major_arrivals(df)).astype(int)
+    df["delay_ratio"] = delay_ratio(df)
+    return df
+
+
+# Colonnes lues par FeatureStore.build (projection du moteur SQL du dashboard)
+STORE_COLUMNS = ["date", "departure_station", "arrival_station", "avg_dep_delay", "avg_arr_delay"]
+
+
+class FeatureStore:
+    def __init__(self, major_stations, route_month_ratio, route_ratio, global_ratio):
+        self.major_stations = frozenset(major_stations)
+        self.route_month_ratio = route_month_ratio
+        self.route_ratio = route_ratio
+        self.global_ratio = global_ratio
+        self._ratio_series = None
+
+    @classmethod
+    def build(cls, df):
+        ratios = pd.DataFrame(
+            {
+                "departure_station": df["departure_station"],
+                "arrival_station": df["arrival_station"],
+                "month": df["date"].dt.month,
+                "delay_ratio": delay_ratio(df),
+            }
+        )
+        route_keys = ["departure_station", "arrival_station"]
+        route_month_ratio = (
+            ratios.groupby(route_keys + ["month"], observed=True)["delay_ratio"]
+            .mean()
+            .dropna()
+        )
+        route_ratio = ratios.groupby(route_keys, observed=True)["delay_ratio"].mean().dropna()
+        global_ratio = ratios["delay_ratio"].mean()
+        if pd.isna(global_ratio):
+            global_ratio = DEFAULT_DELAY_RATIO
+
+        return cls(
+            major_arrivals(df),
+            {(d, a, int(m)): r for (d, a, m), r in route_month_ratio.items()},
+            dict(route_ratio.items()),
+            float(global_ratio),
+        )
+
+    def is_major_arrival(self, arrival_station):
+        return 1 if arrival_station in self.major_stations else 0
+
+    def delay_ratio(self, departure_station, arrival_station, month):
+        # Moyenne historique (trajet, mois), sinon (trajet), sinon globale
+        ratio = self.route_month_ratio.get((departure_station, arrival_station, month))
+        if ratio is None:
+            ratio = self.route_ratio.get((departure_station, arrival_station))
+        if ratio is None:
+            ratio = self.global_ratio
+        return ratio
+
+    def simulator_features(self, departure_station, arrival_station, month, avg_dep_delay):
+        features = dict(SIMULATOR_DEFAULTS)
+        features.update(
+            {
+                "route": make_route(departure_station, arrival_station),
+                "avg_dep_delay": avg_dep_delay,
+                "month": month,
+                "quarter": month_quarter(month),
+                "is_major_arrival": self.is_major_arrival(arrival_station),
+                "delay_ratio": self.delay_ratio(departure_station, arrival_station, month),
+            }
+        )
+        return features
+
+    def _ratio_tables(self):
+        # Versions indexées des tables de ratios pour les lookups vectorisés
+        if self._ratio_series is None:
+            self._ratio_series = (
+                pd.Series(self.route_month_ratio, dtype="float64"),
+                pd.Series(self.route_ratio, dtype="float64"),
+            )
+        return self._ratio_series
+
+    def delay_ratios(self, departures, arrivals, months):
+        route_month, route = self._ratio_tables()
+        ratios = np.full(len(departures), np.nan)
+        if len(route_month):
+            keys = pd.MultiIndex.from_arrays([departures, arrivals, months])
+            ratios = route_month.reindex(keys).to_numpy(copy=True)
+        missing = np.isnan(ratios)
+        if missing.any() and len(route):
+            keys = pd.MultiIndex.from_arrays(
+                [np.asarray(departures)[missing], np.asarray(arrivals)[missing]]
+            )
+            ratios[missing] = route.reindex(keys).to_numpy()
+        return np.where(np.isnan(ratios), self.global_ratio, ratios)
+
+    def batch_frame(self, departures, arrivals, months, avg_dep_delays):
+        # Équivalent vectorisé de simulator_frame pour un lot de requêtes
+        departures = pd.Series(departures, dtype="object").to_numpy()
+        arrivals = pd.Series(arrivals, dtype="object").to_numpy()
+        months = np.asarray(months, dtype="int64")
+        n = len(departures)
+
+        columns = {name: np.full(n, value) for name, value in SIMULATOR_DEFAULTS.items()}
+        columns.update(
+            {
+                "route": (
+                    pd.Series(departures, dtype="object") + " ➜ " + arrivals
+                ).to_numpy(),
+                "avg_dep_delay": np.asarray(avg_dep_delays, dtype="float64"),
+                "month": months,
+                "quarter": month_quarter(months),
+                "is_major_arrival": np.isin(arrivals, list(self.major_stations)).astype(int),
+                "delay_ratio": self.delay_ratios(departures, arrivals, months),
+            }
+        )
+        return pd.DataFrame({name: columns[name] for name in MODEL_FEATURES})
+
+    def known_routes(self):
+        return sorted(self.route_ratio)
+
+    def simulator_frame(self, departure_station, arrival_station, month, avg_dep_delay):
+        features = self.simulator_features(
+            departure_station, arrival_station, month, avg_dep_delay
+        )
+        return pd.DataFrame({name: [features[name]] for name in MODEL_FEATURES})
@@ -0,0 +1,198 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# --- Avis des utilisateurs ---
+# Les avis envoyés depuis la sidebar sont mis en file en mémoire (submit ne
+# bloque jamais le thread du script) ; un thread d'écriture par processus les
+# écrit par lots dans une base SQLite en mode WAL, une transaction par lot.
+# Plusieurs processus du dashboard peuvent écrire dans la même base : le WAL
+# laisse les lectures passer pendant les écritures et busy_timeout sérialise
+# les écrivains.
+#
+#   store = FeedbackStore("feedback.sqlite3")
+#   store.submit(4, "Très utile", page="Statistiques des retards")
+#   store.distribution("page")        # nombre d'avis par note et par page
+
+FEEDBACK_PATH = "feedback.sqlite3"
+FLUSH_INTERVAL = 1.0
+MAX_BATCH = 500
+MAX_PENDING = 10_000
+BUSY_TIMEOUT_MS = 5000
+RATINGS = [1, 2, 3, 4, 5]
+GROUPS = ("page", "day")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    day TEXT NOT NULL,
+    page TEXT,
+    rating INTEGER NOT NULL CHECK (rating BETWEEN 1 AND 5),
+    comment TEXT,
+    session TEXT
+);
+CREATE INDEX IF NOT EXISTS feedback_page ON feedback (page);
+CREATE INDEX IF NOT EXISTS feedback_day ON feedback (day);
+"""
+INSERT = (
+    "INSERT INTO feedback (created_at, day, page, rating, comment, session) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class FeedbackStore:
+    def __init__(
+        self,
+        path=FEEDBACK_PATH,
+        flush_interval=FLUSH_INTERVAL,
+        max_batch=MAX_BATCH,
+        max_pending=MAX_PENDING,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.last_error = None
+        self._queue = queue.Queue(max_pending)
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        connection = connect(path)
+        with connection:
+            connection.executescript(SCHEMA)
+        connection.close()
+        self._writer = threading.Thread(target=self._run, name="tardis-feedback", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def submit(self, rating, comment="", page=None, session=None):
+        # File pleine (base indisponible trop longtemps) : l'avis est perdu
+        # plutôt que de faire attendre la session
+        rating = int(rating)
+        if rating not in RATINGS:
+            raise ValueError(f"La note doit être comprise entre 1 et 5 (reçu {rating})")
+        now = datetime.now(timezone.utc)
+        row = (
+            now.isoformat(timespec="seconds"),
+            now.date().isoformat(),
+            page,
+            rating,
+            (comment or "").strip() or None,
+            session,
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def _next_batch(self):
+        # Attend le premier avis, puis prend tout ce qui est arrivé entre-temps
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        connection = connect(self.path)
+        retry = []
+        while not (self._closed.is_set() and not retry and self._queue.empty()):
+            batch = retry or self._next_batch()
+            if not batch:
+                continue
+            try:
+                with connection:
+                    connection.executemany(INSERT, batch)
+            except sqlite3.Error as error:
+                # Base verrouillée au-delà de busy_timeout : le lot est retenté
+                self.last_error = f"{type(error).__name__}: {error}"
+                retry = batch
+                time.sleep(self.flush_interval)
+                continue
+            retry = []
+            with self._lock:
+                self.written += len(batch)
+                self.batches += 1
+        connection.close()
+
+    def close(self, timeout=10):
+        # Vide la file avant l'arrêt du processus
+        self._closed.set()
+        self._writer.join(timeout)
+
+    def version(self):
+        # Change à chaque lot écrit, y compris par un autre processus : clé
+        # des caches d'agrégats du dashboard
+        stamps = []
+        for path in (self.path, self.path + "-wal"):
+            if os.path.exists(path):
+                stat = os.stat(path)
+                stamps.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+        return "|".join(stamps)
+
+    def query(self, sql, params=()):
+        # Connexion de lecture par appel : les sessions lisent depuis leurs threads
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000)
+        try:
+            return pd.read_sql_query(sql, connection, params=params)
+        finally:
+            connection.close()
+
+    def distribution(self, by="page"):
+        # Nombre d'avis par note (colonnes 1 à 5), total et note moyenne par groupe
+        if by not in GROUPS:
+            raise ValueError(f"Regroupement inconnu : {by} (page ou day)")
+        counts = self.query(
+            f"SELECT coalesce({by}, '') AS {by}, rating, count(*) AS count "
+            f"FROM feedback GROUP BY 1, rating ORDER BY 1, rating"
+        )
+        if counts.empty:
+            return pd.DataFrame(columns=[by] + RATINGS + ["total", "mean"])
+        table = counts.pivot_table(
+            index=by, columns="rating", values="count", aggfunc="sum", fill_value=0
+        ).reindex(columns=RATINGS, fill_value=0)
+        table.columns.name = None
+        table["total"] = table[RATINGS].sum(axis=1)
+        table["mean"] = (table[RATINGS] * RATINGS).sum(axis=1) / table["total"]
+        return table.reset_index()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "written": self.written,
+                "pending": self.pending,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "last_error": self.last_error,
+            }
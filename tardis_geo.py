@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+import tardis_stations
+
+# --- Index géographique des gares ---
+# Coordonnées Lambert 93 (en mètres) de liste-des-gares.csv, rattachées aux
+# noms de gares du dataset nettoyé, dans un KD-tree construit une fois : gare
+# la plus proche, gares dans un rayon ou dans un rectangle sans parcourir
+# toutes les gares. Les agrégats de retards par zone se lisent ensuite dans
+# la table (gare, année) du cube.
+
+# Paramètres de la projection Lambert 93 (RGF93), pour les requêtes en WGS84
+_L93_N = 0.7256077650
+_L93_C = 11754255.426
+_L93_XS = 700000.0
+_L93_YS = 12655612.050
+_L93_LON0 = np.radians(3.0)
+_L93_E = 0.08181919106
+
+
+def to_lambert93(lon, lat):
+    lon = np.radians(np.asarray(lon, dtype="float64"))
+    lat = np.radians(np.asarray(lat, dtype="float64"))
+    e_sin = _L93_E * np.sin(lat)
+    latiso = np.log(np.tan(np.pi / 4 + lat / 2) * ((1 - e_sin) / (1 + e_sin)) ** (_L93_E / 2))
+    radius = _L93_C * np.exp(-_L93_N * latiso)
+    gamma = _L93_N * (lon - _L93_LON0)
+    return _L93_XS + radius * np.sin(gamma), _L93_YS - radius * np.cos(gamma)
+
+
+def station_coordinates(gares):
+    # Une position par nom normalisé : les points voyageurs d'abord, puis la
+    # médiane des points restants (une même gare apparaît sur plusieurs lignes)
+    gares = gares.assign(_voyageurs=gares["VOYAGEURS"].eq("O")).sort_values(
+        "_voyageurs", ascending=False, kind="stable"
+    )
+    best = gares.groupby("LIBELLE", sort=True)["_voyageurs"].transform("max")
+    gares = gares[gares["_voyageurs"] == best]
+    coordinates = gares.groupby("LIBELLE", sort=True).agg(
+        x=("X_L93", "median"),
+        y=("Y_L93", "median"),
+        lon=("X_WGS84", "median"),
+        lat=("Y_WGS84", "median"),
+        department=("DEPARTEMEN", "first"),
+        code_uic=("CODE_UIC", "first"),
+    )
+    coordinates.index.name = "station"
+    return coordinates
+
+
+class StationIndex:
+    def __init__(self, coordinates):
+        self.coordinates = coordinates
+        self.stations = coordinates.index.to_numpy()
+        self.position = {station: i for i, station in enumerate(self.stations)}
+        self.lon = coordinates["lon"].to_numpy()
+        self.lat = coordinates["lat"].to_numpy()
+        self.departments = coordinates["department"].to_numpy()
+        self.by_department = {
+            department: np.flatnonzero(self.departments == department)
+            for department in sorted(set(self.departments))
+        }
+        self.tree = cKDTree(coordinates[["x", "y"]].to_numpy())
+
+    @classmethod
+    def from_gares(cls, gares, stations=None):
+        # stations : noms du dataset nettoyé ; l'index se limite alors aux gares
+        # qui ont des données de retard
+        coordinates = station_coordinates(gares)
+        if stations is not None:
+            coordinates = coordinates[coordinates.index.isin(set(stations))]
+        return cls(coordinates)
+
+    @classmethod
+    def load(cls, path=tardis_stations.GARES_PATH, stations=None):
+        return cls.from_gares(tardis_stations.load_gares(path), stations)
+
+    def __len__(self):
+        return len(self.stations)
+
+    def point(self, station=None, lon=None, lat=None):
+        # Point Lambert 93 d'une gare de l'index ou de coordonnées WGS84
+        if station is not None:
+            return self.tree.data[self.position[station]]
+        return np.array(to_lambert93(lon, lat))
+
+    def _result(self, indices, distances):
+        return pd.DataFrame(
+            {
+                "station": self.stations[indices],
+                "distance_km": np.asarray(distances) / 1000,
+                "department": self.departments[indices],
+                "lat": self.lat[indices],
+                "lon": self.lon[indices],
+            }
+        )
+
+    def nearest(self, station=None, lon=None, lat=None, k=1):
+        center = self.point(station, lon, lat)
+        k = min(k, len(self))
+        distances, indices = self.tree.query(center, k=k)
+        return self._result(np.atleast_1d(indices), np.atleast_1d(distances))
+
+    def within_radius(self, radius_km, station=None, lon=None, lat=None):
+        center = self.point(station, lon, lat)
+        indices = np.asarray(self.tree.query_ball_point(center, radius_km * 1000), dtype=int)
+        distances = np.hypot(*(self.tree.data[indices] - center).T)
+        order = np.argsort(distances, kind="stable")
+        return self._result(indices[order], distances[order])
+
+    def within_bbox(self, lon_min, lat_min, lon_max, lat_max):
+        # Cercle circonscrit au rectangle interrogé dans le KD-tree, puis
+        # filtrage exact des candidats en WGS84
+        corners = np.column_stack(
+            to_lambert93([lon_min, lon_min, lon_max, lon_max], [lat_min, lat_max, lat_min, lat_max])
+        )
+        center = corners.mean(axis=0)
+        radius = np.hypot(*(corners - center).T).max()
+        candidates = np.asarray(self.tree.query_ball_point(center, radius), dtype=int)
+        lon, lat = self.lon[candidates], self.lat[candidates]
+        inside = (lon >= lon_min) & (lon <= lon_max) & (lat >= lat_min) & (lat <= lat_max)
+        indices = np.sort(candidates[inside])
+        return self._result(indices, np.hypot(*(self.tree.data[indices] - center).T))
+
+    def in_department(self, department):
+        indices = self.by_department.get(department, np.array([], dtype=int))
+        return self._result(indices, np.zeros(len(indices)))
+
+    def hub_neighbourhoods(self, hubs, radius_km):
+        # Gares à moins de radius_km de chaque hub, en une requête groupée
+        hubs = [hub for hub in hubs if hub in self.position]
+        centers = self.tree.data[[self.position[hub] for hub in hubs]]
+        neighbours = self.tree.query_ball_point(centers, radius_km * 1000)
+        return {hub: list(self.stations[indices]) for hub, indices in zip(hubs, neighbours)}
@@ -0,0 +1,284 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+import tardis_features
+
+# --- Artefact d'inférence léger ---
+# Le pipeline sklearn sauvegardé (OneHotEncoder + StandardScaler + XGBoost)
+# est exporté en fichiers simples : l'index de colonne de chaque trajet, les
+# moyennes/échelles du scaler et le booster au format JSON natif d'XGBoost.
+# LightPredictor relit ces fichiers sans sklearn ni xgboost et parcourt les
+# arbres directement sur des lignes NumPy, avec les mêmes sorties que
+# pipeline.predict.
+#
+#   python tardis_inference.py tardis_best_model.pkl   # -> tardis_best_model/
+
+PREPROCESSING_NAME = "preprocessing.json"
+BOOSTER_NAME = "booster.json"
+# Lignes parcourues à la fois : les tableaux de nœuds font n x nombre d'arbres
+MATRIX_CHUNK_ROWS = 256
+
+
+def artifact_path(model_path):
+    return os.path.splitext(model_path)[0]
+
+
+def is_artifact_fresh(model_path):
+    # Comme le store Parquet : périmé s'il est absent ou plus ancien que le .pkl
+    booster = os.path.join(artifact_path(model_path), BOOSTER_NAME)
+    if not os.path.exists(booster):
+        return False
+    if not os.path.exists(model_path):
+        return True
+    return os.path.getmtime(booster) >= os.path.getmtime(model_path)
+
+
+def export_artifact(pipeline, directory):
+    preprocessor = pipeline.named_steps["preprocessor"]
+    regressor = pipeline.named_steps["regressor"]
+    if not hasattr(regressor, "get_booster"):
+        raise ValueError("Seuls les modèles XGBoost peuvent être exportés")
+    # Sortie creuse : XGBoost ne voit pas les zéros, qui suivent alors la
+    # branche par défaut comme les NaN. Une sortie dense les compare au seuil.
+    sparse = bool(getattr(preprocessor, "sparse_output_", False))
+
+    # Position de chaque variable dans la sortie du ColumnTransformer
+    names_in = list(preprocessor.feature_names_in_)
+    routes, route_offset, columns = [], 0, []
+    offset = 0
+    for _, transformer, selected in preprocessor.transformers_:
+        if isinstance(transformer, str) and transformer == "drop":
+            continue
+        selected = [names_in[c] if isinstance(c, (int, np.integer)) else c for c in selected]
+        if hasattr(transformer, "categories_"):
+            routes = [str(route) for route in transformer.categories_[0]]
+            route_offset = offset
+            offset += len(routes)
+            continue
+        mean = getattr(transformer, "mean_", None)
+        scale = getattr(transformer, "scale_", None)
+        for i, name in enumerate(selected):
+            columns.append(
+                {
+                    "feature": name,
+                    "index": offset + i,
+                    "mean": float(mean[i]) if mean is not None else 0.0,
+                    "scale": float(scale[i]) if scale is not None else 1.0,
+                }
+            )
+        offset += len(selected)
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, PREPROCESSING_NAME), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "features": tardis_features.MODEL_FEATURES,
+                "routes": routes,
+                "route_offset": route_offset,
+                "columns": columns,
+                "n_columns": offset,
+                "sparse": sparse,
+            },
+            f,
+            ensure_ascii=False,
+        )
+    # Écrit en dernier : sa date sert de témoin de fraîcheur
+    regressor.get_booster().save_model(os.path.join(directory, BOOSTER_NAME))
+    return directory
+
+
+def _read_trees(booster):
+    # Arbres XGBoost mis bout à bout dans des tableaux plats : l'indice global
+    # d'un nœud est son indice local + le décalage de son arbre. Les feuilles
+    # pointent sur elles-mêmes, le parcours peut donc continuer sans test.
+    learner = booster["learner"]
+    base_score = float(
+        str(learner["learner_model_param"]["base_score"]).strip("[]").split(",")[0]
+    )
+    trees = learner["gradient_booster"]["model"]["trees"]
+
+    left, right, split_index, threshold, default_left, roots = [], [], [], [], [], []
+    depth = 0
+    offset = 0
+    for tree in trees:
+        tree_left = np.asarray(tree["left_children"], dtype=np.int64)
+        tree_right = np.asarray(tree["right_children"], dtype=np.int64)
+        nodes = np.arange(len(tree_left))
+        leaf = tree_left == -1
+        left.append(np.where(leaf, nodes, tree_left) + offset)
+        right.append(np.where(leaf, nodes, tree_right) + offset)
+        split_index.append(np.where(leaf, 0, tree["split_indices"]))
+        # Pour une feuille, split_conditions contient la valeur de la feuille
+        threshold.append(np.asarray(tree["split_conditions"], dtype=np.float32))
+        default_left.append(np.asarray(tree["default_left"], dtype=bool))
+        roots.append(offset)
+        depth = max(depth, _tree_depth(tree_left, tree_right))
+        offset += len(tree_left)
+
+    return {
+        "base_score": np.float32(base_score),
+        "left": np.concatenate(left),
+        "right": np.concatenate(right),
+        "split_index": np.concatenate(split_index).astype(np.int64),
+        "threshold": np.concatenate(threshold),
+        "default_left": np.concatenate(default_left),
+        "roots": np.asarray(roots, dtype=np.int64),
+        "depth": depth,
+    }
+
+
+def _tree_depth(left, right):
+    depth, level = 0, [0]
+    while level:
+        children = [c for node in level for c in (left[node], right[node]) if c != -1]
+        if not children:
+            break
+        depth += 1
+        level = children
+    return depth
+
+
+class LightPredictor:
+    def __init__(self, preprocessing, trees):
+        self.features = preprocessing["features"]
+        self.route_index = {
+            route: preprocessing["route_offset"] + i
+            for i, route in enumerate(preprocessing["routes"])
+        }
+        self.n_columns = preprocessing["n_columns"]
+        # Artefacts exportés avant l'ajout du drapeau : pipeline à sortie creuse
+        self.zero_missing = preprocessing.get("sparse", True)
+        columns = preprocessing["columns"]
+        self.column_features = [c["feature"] for c in columns]
+        self.column_index = np.array([c["index"] for c in columns], dtype=np.int64)
+        self.column_mean = np.array([c["mean"] for c in columns], dtype=np.float64)
+        self.column_scale = np.array([c["scale"] for c in columns], dtype=np.float64)
+
+        self.base_score = trees["base_score"]
+        self.left = trees["left"]
+        self.right = trees["right"]
+        self.split_index = trees["split_index"]
+        self.threshold = trees["threshold"]
+        self.default_left = trees["default_left"]
+        self.roots = trees["roots"]
+        self.depth = trees["depth"]
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, PREPROCESSING_NAME), encoding="utf-8") as f:
+            preprocessing = json.load(f)
+        with open(os.path.join(directory, BOOSTER_NAME), encoding="utf-8") as f:
+            booster = json.load(f)
+        return cls(preprocessing, _read_trees(booster))
+
+    def transform(self, routes, values):
+        # routes : n trajets ; values : n x len(column_features), ordre de column_features
+        values = np.asarray(values, dtype=np.float64).reshape(len(routes), -1)
+        X = np.zeros((len(routes), self.n_columns), dtype=np.float32)
+        X[:, self.column_index] = (values - self.column_mean) / self.column_scale
+        for row, route in enumerate(routes):
+            column = self.route_index.get(route)
+            if column is not None:
+                X[row, column] = 1
+        return X
+
+    def _missing(self, x):
+        # Avec une matrice creuse, les zéros ne sont pas stockés et suivent
+        # donc la branche par défaut, comme les NaN
+        if self.zero_missing:
+            return (x == 0) | np.isnan(x)
+        return np.isnan(x)
+
+    def predict_matrix(self, X):
+        # Par blocs de MATRIX_CHUNK_ROWS : la mémoire reste bornée quel que
+        # soit le nombre de lignes
+        X = np.asarray(X, dtype=np.float32)
+        if len(X) <= MATRIX_CHUNK_ROWS:
+            return self._predict_block(X)
+        return np.concatenate(
+            [
+                self._predict_block(X[start : start + MATRIX_CHUNK_ROWS])
+                for start in range(0, len(X), MATRIX_CHUNK_ROWS)
+            ]
+        )
+
+    def _predict_block(self, X):
+        rows = np.arange(len(X))[:, None]
+        missing = self._missing(X)
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            features = self.split_index[nodes]
+            go_left = np.where(
+                missing[rows, features],
+                self.default_left[nodes],
+                X[rows, features] < self.threshold[nodes],
+            )
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        # Somme arbre par arbre en float32 à partir de base_score, comme XGBoost
+        leaves = np.concatenate(
+            [np.full((len(X), 1), self.base_score, dtype=np.float32), self.threshold[nodes]],
+            axis=1,
+        )
+        # Copie de la dernière colonne : une vue garderait toute la somme cumulée
+        return np.cumsum(leaves, axis=1, dtype=np.float32)[:, -1].copy()
+
+    def predict_row(self, x):
+        # Même parcours que predict_matrix pour une seule ligne (indices 1D)
+        x = np.asarray(x, dtype=np.float32)
+        missing = self._missing(x)
+        nodes = self.roots
+        for _ in range(self.depth):
+            features = self.split_index[nodes]
+            go_left = np.where(
+                missing[features], self.default_left[nodes], x[features] < self.threshold[nodes]
+            )
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        leaves = np.concatenate([[self.base_score], self.threshold[nodes]])
+        return np.cumsum(leaves, dtype=np.float32)[-1]
+
+    def predict(self, X):
+        # Remplaçant de pipeline.predict sur un DataFrame de MODEL_FEATURES,
+        # transformé bloc par bloc comme predict_matrix
+        routes = X["route"].astype(str).tolist()
+        values = X[self.column_features].to_numpy(dtype=np.float64)
+        return np.concatenate(
+            [
+                self.predict_matrix(
+                    self.transform(
+                        routes[start : start + MATRIX_CHUNK_ROWS],
+                        values[start : start + MATRIX_CHUNK_ROWS],
+                    )
+                )
+                for start in range(0, len(routes), MATRIX_CHUNK_ROWS)
+            ]
+            or [np.empty(0, dtype=np.float32)]
+        )
+
+    def predict_features(self, features):
+        # Une requête du simulateur (dict de FeatureStore.simulator_features),
+        # sans DataFrame
+        values = [features[name] for name in self.column_features]
+        return self.predict_row(self.transform([features["route"]], values)[0])
+
+
+def load_pipeline_and_export(model_path, directory=None):
+    import joblib
+
+    return export_artifact(joblib.load(model_path), directory or artifact_path(model_path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export de l'artefact d'inférence léger")
+    parser.add_argument("model", nargs="?", default="tardis_best_model.pkl")
+    parser.add_argument("-o", "--output", help="Dossier de l'artefact (défaut : à côté du .pkl)")
+    args = parser.parse_args(argv)
+
+    directory = load_pipeline_and_export(args.model, args.output)
+    print(f"💾 Artefact d'inférence exporté dans {directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import logging
+import os
+
+import streamlit as st
+
+import tardis_aggregates
+import tardis_features
+import tardis_feedback
+import tardis_geo
+import tardis_metrics
+import tardis_predict
+import tardis_query
+import tardis_reasons
+import tardis_render
+import tardis_store
+import tardis_update
+import tardis_warmup
+
+# --- Chargements en cache du dashboard ---
+# Configuration (variables d'environnement), fonctions en cache et tâches de
+# préchauffage, dans un module importable : les caches Streamlit sont propres
+# au processus et indexés par module, les threads du préchauffage remplissent
+# donc les mêmes entrées que les sessions. Le préchauffage est un singleton
+# du processus, lancé par tardis_warmup.py avant le serveur ou au premier
+# rerun du dashboard ; ses threads tournent hors de toute session.
+#
+#   warmup = tardis_loaders.start_warmup(data_version, model_version)
+#   warmup.wait(60)
+
+METRICS = tardis_metrics.METRICS
+
+# Mode mémoire compact (catégories, entiers courts, float32) : TARDIS_COMPACT=1
+COMPACT_MEMORY = os.environ.get("TARDIS_COMPACT", "0") == "1"
+
+# Dataset partagé par les processus Streamlit de l'hôte (fichiers mappés en
+# mémoire, en lecture seule) : TARDIS_SHARED=1. Les tables dérivées passent
+# alors aussi par st.cache_resource, sans copie à chaque rerun.
+SHARED_MEMORY = os.environ.get("TARDIS_SHARED", "0") == "1"
+data_cache = st.cache_resource if SHARED_MEMORY else st.cache_data
+
+# Moteur SQL embarqué (DuckDB) : agrégats et filtres calculés sur le store
+# sans charger le dataset entier en mémoire, TARDIS_SQL=1
+SQL_BACKEND = os.environ.get("TARDIS_SQL", "0") == "1"
+if SQL_BACKEND and not tardis_query.is_available():
+    print("❌ TARDIS_SQL=1 mais duckdb n'est pas installé : retour aux calculs pandas")
+    SQL_BACKEND = False
+
+# Préchauffage en arrière-plan au démarrage du processus (TARDIS_WARMUP=0
+# pour le désactiver) ; TARDIS_READY_FILE est écrit quand il est terminé
+WARMUP = os.environ.get("TARDIS_WARMUP", "1") == "1"
+WARMUP_WORKERS = int(os.environ.get("TARDIS_WARMUP_WORKERS", tardis_warmup.DEFAULT_WORKERS))
+READY_FILE = os.environ.get("TARDIS_READY_FILE")
+
+# Balayages du simulateur gardés en cache (un par trajet et par version), les
+# plus anciens sont évincés
+SWEEP_CACHE_ENTRIES = 256
+
+# Base SQLite des avis de la sidebar, partagée par les processus du dashboard
+FEEDBACK_PATH = os.environ.get("TARDIS_FEEDBACK", tardis_feedback.FEEDBACK_PATH)
+# Distributions des avis en cache : chaque écriture crée une nouvelle version,
+# seules les dernières sont utiles
+FEEDBACK_CACHE_ENTRIES = 2 * len(tardis_feedback.GROUPS)
+
+# Bornes des notes de fiabilité (min), ex. TARDIS_RELIABILITY_THRESHOLDS=2,5,10,15
+RELIABILITY_THRESHOLDS = list(tardis_aggregates.RELIABILITY_THRESHOLDS)
+if "TARDIS_RELIABILITY_THRESHOLDS" in os.environ:
+    try:
+        RELIABILITY_THRESHOLDS = tardis_aggregates.parse_thresholds(
+            os.environ["TARDIS_RELIABILITY_THRESHOLDS"]
+        )
+    except ValueError as error:
+        print(f"❌ TARDIS_RELIABILITY_THRESHOLDS ignoré ({error}) : bornes par défaut")
+
+
+
+# --- Chargement des données et modèle ---
+def read_data(compact=COMPACT_MEMORY, csv_path=tardis_store.CSV_PATH):
+    df = tardis_store.load_cleaned(csv_path)
+    if "date" in df.columns:
+        df["month"] = df["date"].dt.month
+        df["year"] = df["date"].dt.year
+        df["hour"] = df["date"].dt.hour
+    if compact:
+        memory = tardis_store.compact(df)
+        print(
+            f"💾 Mémoire du dataset : {memory['before'] / 1e6:.1f} Mo -> "
+            f"{memory['after'] / 1e6:.1f} Mo"
+        )
+    return df
+
+
+@METRICS.cached(data_cache)
+def load_data(data_version, compact=COMPACT_MEMORY):
+    # data_version sert uniquement de clé de cache : un nouveau store invalide le cache
+    if not SHARED_MEMORY:
+        return read_data(compact)
+    # Le premier processus publie la version, les suivants s'y attachent
+    variant = "compact" if compact else None
+    df = tardis_store.load_mmap(data_version, variant=variant)
+    if df is None:
+        tardis_store.publish_mmap(read_data(compact), data_version, variant=variant)
+        df = tardis_store.load_mmap(data_version, variant=variant)
+    return df
+
+
+@METRICS.cached(st.cache_resource)
+def load_query_engine(data_version):
+    return tardis_query.QueryEngine.open()
+
+
+@METRICS.cached(data_cache)
+def load_cube(data_version):
+    # Store partitionné : tranches mensuelles du cube déjà calculées
+    cube = tardis_update.load_cube()
+    if cube is None:
+        cube = tardis_aggregates.build_cube(load_data(data_version))
+    return cube
+
+
+# En mode SQL, les agrégats des pages sont des requêtes paramétrées (filtres
+# gare/année poussés dans le scan) ; sinon ils se lisent dans le cube
+@METRICS.cached(data_cache)
+def load_years(data_version):
+    if SQL_BACKEND:
+        return load_query_engine(data_version).years()
+    return sorted(load_cube(data_version)["year"].dropna().unique())
+
+
+@METRICS.cached(data_cache)
+def load_station_table(data_version, station_col, year=None):
+    if SQL_BACKEND:
+        return load_query_engine(data_version).station_year_table(station_col, year)
+    table = tardis_aggregates.station_year_table(load_cube(data_version), station_col)
+    if year is not None:
+        table = table[table["year"] == year]
+    return table
+
+
+@METRICS.cached(data_cache)
+def load_delay_stats(data_version, departure=None, arrival=None):
+    if SQL_BACKEND:
+        totals = load_query_engine(data_version).delay_totals(departure, arrival)
+        return tardis_aggregates.totals_stats(totals)
+    return tardis_aggregates.delay_stats(load_cube(data_version), departure, arrival)
+
+
+@METRICS.cached(data_cache)
+def load_reliability_rankings(data_version, station_col, thresholds=RELIABILITY_THRESHOLDS):
+    # Classements de fiabilité de toutes les années, calculés en un passage,
+    # limités au plus grand top-N proposé par la page
+    prefix = "dep" if station_col == "departure_station" else "arr"
+    return tardis_aggregates.reliability_rankings(
+        load_station_table(data_version, station_col),
+        station_col,
+        prefix,
+        thresholds,
+        n=max(tardis_render.TOP_N_OPTIONS),
+    )
+
+
+@METRICS.cached(st.cache_resource)
+def load_station_graph(data_version):
+    if SQL_BACKEND:
+        return tardis_aggregates.StationGraph(load_query_engine(data_version).routes())
+    return tardis_aggregates.StationGraph.from_cube(load_cube(data_version))
+
+
+@METRICS.cached(st.cache_resource)
+def load_station_index(data_version):
+    # KD-tree des gares du dataset (coordonnées de liste-des-gares.csv)
+    return tardis_geo.StationIndex.load(stations=load_station_graph(data_version).stations)
+
+
+@METRICS.cached(data_cache)
+def load_reason_index(data_version):
+    if SQL_BACKEND:
+        rows = load_query_engine(data_version).comment_rows()
+    else:
+        rows = load_data(data_version)
+    reason_index = tardis_reasons.build_reason_index(rows)
+    return reason_index, tardis_reasons.reason_slices(reason_index)
+
+
+@METRICS.cached(st.cache_resource)
+def load_feature_store(data_version):
+    if SQL_BACKEND:
+        columns = tardis_features.STORE_COLUMNS
+        return tardis_features.FeatureStore.build(load_query_engine(data_version).frame(columns))
+    return tardis_features.FeatureStore.build(load_data(data_version))
+
+
+@METRICS.cached(st.cache_resource)
+def load_model(model_version):
+    # Artefact léger (sans sklearn/xgboost) s'il est à jour, sinon le pipeline
+    return tardis_predict.load_model()
+
+
+@METRICS.cached(st.cache_resource)
+def load_batch_model(model_version):
+    # Pipeline natif pour les lots (balayage du simulateur), chargé au premier
+    # balayage seulement : l'artefact léger n'est rapide que ligne par ligne
+    return tardis_predict.load_model(light=False)
+
+
+@METRICS.cached(st.cache_resource)
+def load_prediction_cache(data_version):
+    # Un cache par version des données, partagé par toutes les sessions
+    return tardis_predict.PredictionCache()
+
+
+@METRICS.cached(data_cache(max_entries=SWEEP_CACHE_ENTRIES))
+def load_delay_sweep(departure_station, arrival_station, data_version, model_version):
+    # Grille retard au départ x mois d'un trajet : un seul predict par
+    # (trajet, version des données, version du modèle)
+    return tardis_predict.delay_sweep(
+        load_batch_model(model_version),
+        load_feature_store(data_version),
+        departure_station,
+        arrival_station,
+    )
+
+
+@st.cache_resource
+def load_feedback_store():
+    # Un thread d'écriture par processus, partagé par toutes les sessions
+    return tardis_feedback.FeedbackStore(FEEDBACK_PATH)
+
+
+@METRICS.cached(st.cache_data(max_entries=FEEDBACK_CACHE_ENTRIES))
+def load_feedback_distribution(by, feedback_version):
+    return load_feedback_store().distribution(by)
+
+
+
+@METRICS.cached(data_cache)
+def load_card_fragments(page, year, data_version, top_n):
+    # Fragments HTML (départs, arrivées) d'une page de classement, mis en
+    # cache par (page, filtre année, version des données, top-N)
+    fragments = []
+    for station_col, prefix in [("departure_station", "dep"), ("arrival_station", "arr")]:
+        if page == "Gares avec plus de retards":
+            table = load_station_table(data_version, station_col, year)
+            top = tardis_aggregates.top_stations(table, station_col, prefix, year, n=top_n)
+            fragments.append(tardis_render.ranking_cards(top.index, top.to_numpy()))
+        else:
+            rankings = load_reliability_rankings(data_version, station_col)
+            key = tardis_aggregates.ALL_YEARS if year is None else year
+            top = rankings[(rankings["year"] == key) & (rankings["rank"] <= top_n)]
+            fragments.append(
+                tardis_render.reliability_cards(top[station_col], top["mean"], top["score"])
+            )
+    return fragments
+
+
+def warm_prediction(data_version, model_version):
+    # Première prédiction factice : le premier predict est le plus lent
+    feature_store = load_feature_store(data_version)
+    departure, arrival = feature_store.known_routes()[0]
+    load_model(model_version).predict(feature_store.simulator_frame(departure, arrival, 1, 5.0))
+
+
+def warmup_tasks(data_version, model_version):
+    # {nom: (fonction, dépendances)} : données et modèle en parallèle, puis les
+    # tables dérivées et les classements de toutes les valeurs du filtre année
+    data = [] if SQL_BACKEND else ["data"]
+    cube = [] if SQL_BACKEND else ["cube"]
+    tasks = {
+        "model": (lambda: load_model(model_version), []),
+        "years": (lambda: load_years(data_version), cube),
+        "station_graph": (lambda: load_station_graph(data_version), cube),
+        "station_index": (lambda: load_station_index(data_version), ["station_graph"]),
+        "reason_index": (lambda: load_reason_index(data_version), data),
+        "feature_store": (lambda: load_feature_store(data_version), data),
+        "prediction": (
+            lambda: warm_prediction(data_version, model_version),
+            ["model", "feature_store"],
+        ),
+    }
+    if not SQL_BACKEND:
+        tasks["data"] = (lambda: load_data(data_version), [])
+        tasks["cube"] = (lambda: load_cube(data_version), data)
+    for station_col in ["departure_station", "arrival_station"]:
+        tasks[f"rankings:{station_col}"] = (
+            lambda col=station_col: load_reliability_rankings(data_version, col),
+            cube,
+        )
+    ranking_pages = ["Gares avec plus de retards", "Gares les plus fiables"]
+    for ranking_page in ranking_pages:
+        tasks[f"cards:{ranking_page}"] = (
+            lambda name=ranking_page: [
+                load_card_fragments(name, year, data_version, tardis_render.TOP_N_OPTIONS[0])
+                for year in [None] + load_years(data_version)
+            ],
+            ["years", "rankings:departure_station", "rankings:arrival_station"],
+        )
+    return tasks
+
+
+@st.cache_resource(show_spinner=False)
+def start_warmup(data_version, model_version):
+    # Un préchauffage par processus et par version des données et du modèle.
+    # Ses threads n'ont pas de contexte de session : les fonctions en cache y
+    # tournent comme en mode "bare", sans rien écrire dans une page.
+    warmup = tardis_warmup.Warmup(WARMUP_WORKERS, READY_FILE)
+    return warmup.run(warmup_tasks(data_version, model_version) if WARMUP else {})
+
+
+class _WarmupContextFilter(logging.Filter):
+    # Streamlit signale chaque appel en cache sans contexte de session ; c'est
+    # le cas normal des threads du préchauffage
+    def filter(self, record):
+        return not record.threadName.startswith(tardis_warmup.THREAD_PREFIX)
+
+
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+    _WarmupContextFilter()
+)
+
+# Au démarrage du processus : la sonde ne doit pas voir le fichier de
+# disponibilité d'une exécution précédente
+tardis_warmup.clear_ready_file(READY_FILE)
@@ -0,0 +1,278 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+# --- Instrumentation des chemins chauds ---
+# Registre unique par processus (le module n'est importé qu'une fois, les
+# reruns Streamlit le retrouvent) : durées par étape nommée, appels et
+# exécutions des fonctions mises en cache, et profil optionnel du dernier
+# rerun. La page cachée de diagnostic du dashboard lit ce registre.
+#
+#   TARDIS_PROFILE=cprofile streamlit run tardis_dashboard.py
+#   TARDIS_PROFILE=cprofile,tracemalloc TARDIS_PROFILE_DIR=profils streamlit run ...
+
+STAGE_WINDOW = 1000
+PROFILE_HISTORY = 5
+PROFILE_LINES = 30
+PROFILE_MODES = ("cprofile", "tracemalloc")
+REPORT_SECTIONS = PROFILE_MODES + ("notes",)
+STAGE_COLUMNS = ["stage", "count", "p50_ms", "p95_ms", "max_ms", "last_ms"]
+
+
+class Timer:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = time.perf_counter()
+        self.elapsed = None
+
+    def stop(self):
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self.start
+            self.metrics.record(self.name, self.elapsed)
+        return self.elapsed
+
+
+class Metrics:
+    def __init__(self, window=STAGE_WINDOW):
+        self.window = window
+        self.durations = {}
+        self.calls = {}
+        self.misses = {}
+        self.profiles = deque(maxlen=PROFILE_HISTORY)
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            if name not in self.durations:
+                self.durations[name] = deque(maxlen=self.window)
+            self.durations[name].append(seconds)
+
+    def start(self, name):
+        return Timer(self, name)
+
+    @contextmanager
+    def stage(self, name):
+        timer = self.start(name)
+        try:
+            yield timer
+        finally:
+            timer.stop()
+
+    def timed(self, name=None):
+        def decorator(func):
+            stage = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def count_call(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count_miss(self, name):
+        with self._lock:
+            self.misses[name] = self.misses.get(name, 0) + 1
+
+    def cached(self, cache, name=None):
+        # Enveloppe un décorateur de cache (st.cache_data, st.cache_resource) :
+        # le corps ne s'exécute que sur un miss, les hits s'en déduisent
+        def decorator(func):
+            stage = name or func.__name__
+
+            @functools.wraps(func)
+            def body(*args, **kwargs):
+                self.count_miss(stage)
+                return func(*args, **kwargs)
+
+            cached_body = cache(body)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage):
+                    result = cached_body(*args, **kwargs)
+                self.count_call(stage)
+                return result
+
+            wrapper.clear = cached_body.clear
+            return wrapper
+
+        return decorator
+
+    def stage_table(self):
+        with self._lock:
+            durations = {name: np.asarray(values) for name, values in self.durations.items()}
+        rows = []
+        for name, values in sorted(durations.items()):
+            p50, p95 = np.percentile(values, [50, 95]) * 1000
+            rows.append(
+                {
+                    "stage": name,
+                    "count": len(values),
+                    "p50_ms": p50,
+                    "p95_ms": p95,
+                    "max_ms": values.max() * 1000,
+                    "last_ms": values[-1] * 1000,
+                }
+            )
+        return pd.DataFrame(rows, columns=STAGE_COLUMNS)
+
+    def cache_table(self):
+        with self._lock:
+            calls, misses = dict(self.calls), dict(self.misses)
+        rows = []
+        for name in sorted(set(calls) | set(misses)):
+            total, miss = calls.get(name, 0), misses.get(name, 0)
+            hits = max(total - miss, 0)
+            rows.append(
+                {
+                    "cache": name,
+                    "calls": total,
+                    "hits": hits,
+                    "misses": miss,
+                    "hit_rate": hits / total if total else 0.0,
+                }
+            )
+        return pd.DataFrame(rows, columns=["cache", "calls", "hits", "misses", "hit_rate"])
+
+    def reset(self):
+        with self._lock:
+            self.durations.clear()
+            self.calls.clear()
+            self.misses.clear()
+            self.profiles.clear()
+
+
+METRICS = Metrics()
+
+
+# --- Profil optionnel d'un rerun ---
+def profile_modes(value=None):
+    value = os.environ.get("TARDIS_PROFILE", "") if value is None else value
+    return [mode for mode in value.replace(" ", "").split(",") if mode in PROFILE_MODES]
+
+
+# tracemalloc est global au processus : démarré par le premier profil actif,
+# arrêté par le dernier (et seulement si ce n'est pas quelqu'un d'autre qui
+# l'avait démarré)
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+
+def _acquire_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0:
+            _tracemalloc_owned = not tracemalloc.is_tracing()
+            if _tracemalloc_owned:
+                tracemalloc.start()
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+
+
+class RerunProfiler:
+    # cProfile et/ou tracemalloc sur un rerun ; le résultat texte est gardé
+    # dans METRICS.profiles et, si TARDIS_PROFILE_DIR est défini, écrit sur disque.
+    # Un profil actif par thread : chaque session Streamlit rejoue son script
+    # dans son propre thread.
+    _local = threading.local()
+
+    def __init__(self, label, modes, metrics=METRICS, directory=None):
+        self.label = label
+        self.modes = modes
+        self.metrics = metrics
+        self.directory = directory
+        self.profiler = None
+        self.tracing = False
+        self.notes = []
+
+    @classmethod
+    def active(cls):
+        return getattr(cls._local, "profiler", None)
+
+    @classmethod
+    def from_env(cls, label, metrics=METRICS):
+        modes = profile_modes()
+        if not modes:
+            return None
+        return cls(label, modes, metrics, os.environ.get("TARDIS_PROFILE_DIR")).start()
+
+    def start(self):
+        # Profil du même thread resté actif (rerun interrompu avant stop())
+        previous = RerunProfiler.active()
+        if previous is not None:
+            previous.discard()
+        RerunProfiler._local.profiler = self
+        if "tracemalloc" in self.modes:
+            _acquire_tracemalloc()
+            self.tracing = True
+        if "cprofile" in self.modes:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self.profiler = profiler
+            except ValueError:
+                # Python 3.12+ : un seul cProfile actif à la fois dans le processus
+                self.notes.append("cprofile ignoré : un autre rerun est déjà profilé")
+        return self
+
+    def discard(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler = None
+        if self.tracing:
+            _release_tracemalloc()
+            self.tracing = False
+        if RerunProfiler.active() is self:
+            RerunProfiler._local.profiler = None
+
+    def stop(self):
+        report = {"label": self.label, "time": time.strftime("%H:%M:%S")}
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        if self.profiler is not None:
+            self.profiler.disable()
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profiler, stream=stream)
+            stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
+            report["cprofile"] = stream.getvalue()
+            if self.directory:
+                os.makedirs(self.directory, exist_ok=True)
+                stats.dump_stats(os.path.join(self.directory, f"rerun-{stamp}.prof"))
+        if self.tracing:
+            # Allocations de tout le processus, sessions concurrentes comprises
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            top = snapshot.statistics("lineno")[:PROFILE_LINES]
+            report["tracemalloc"] = "\n".join(
+                [f"current {current / 1e6:.1f} Mo, peak {peak / 1e6:.1f} Mo"]
+                + [str(stat) for stat in top]
+            )
+        if self.notes:
+            report["notes"] = "\n".join(self.notes)
+        self.discard()
+        self.metrics.profiles.append(report)
+        return report
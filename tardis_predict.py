@@ -0,0 +1,262 @@
+import argparse
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import tardis_features
+import tardis_inference
+import tardis_store
+
+# --- Prédiction par lots ---
+# Charge une fois le pipeline sauvegardé par tardis_model.ipynb et le magasin
+# de features, puis score des requêtes (départ, arrivée, mois, retard au
+# départ) par gros lots. Utilisable en module ou en ligne de commande :
+#
+#   python tardis_predict.py requetes.csv -o predictions.csv
+#   python tardis_predict.py --grid --avg-dep-delay 5 -o grille.jsonl
+
+MODEL_PATH = "tardis_best_model.pkl"
+
+QUERY_COLUMNS = ["departure_station", "arrival_station", "month", "avg_dep_delay"]
+QUERY_ALIASES = {"departure": "departure_station", "arrival": "arrival_station"}
+PREDICTION_COLUMN = "predicted_arr_delay"
+
+DEFAULT_BATCH_SIZE = 50_000
+
+# Cache des prédictions du simulateur
+DEFAULT_CACHE_SIZE = 4096
+DELAY_DECIMALS = 1
+
+# Balayage du simulateur : retards au départ de 0 à 120 min, minute par minute
+SWEEP_DELAYS = np.arange(0, 121, dtype="float64")
+MONTHS = np.arange(1, 13)
+
+
+def load_model(path=MODEL_PATH, light=True):
+    # L'artefact exporté par tardis_inference évite de charger sklearn et
+    # xgboost ; le pipeline complet reste la référence s'il est plus récent.
+    # L'artefact n'est plus rapide que pour des lignes isolées : les lots
+    # (CLI, service, balayage du simulateur) passent par light=False.
+    if light and tardis_inference.is_artifact_fresh(path):
+        return tardis_inference.LightPredictor.load(tardis_inference.artifact_path(path))
+    return joblib.load(path)
+
+
+def model_version(path=MODEL_PATH):
+    if tardis_inference.is_artifact_fresh(path):
+        path = os.path.join(tardis_inference.artifact_path(path), tardis_inference.BOOSTER_NAME)
+    if not os.path.exists(path):
+        return "absent"
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _is_jsonl(path):
+    return path.endswith((".jsonl", ".ndjson"))
+
+
+def normalize_queries(queries):
+    queries = queries.rename(columns=QUERY_ALIASES)
+    missing = [col for col in QUERY_COLUMNS if col not in queries.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes dans les requêtes : {', '.join(missing)}")
+    queries = queries[QUERY_COLUMNS].copy()
+    for col in ["departure_station", "arrival_station"]:
+        queries[col] = queries[col].astype(str).str.lower().str.strip()
+    queries["month"] = queries["month"].astype("int64")
+    # Un mois hors calendrier retomberait sans bruit sur les features du trajet
+    invalid = queries.index[~queries["month"].between(1, 12)]
+    if len(invalid):
+        rows = ", ".join(str(row) for row in invalid[:5])
+        raise ValueError(f"month doit être compris entre 1 et 12 (lignes {rows})")
+    queries["avg_dep_delay"] = queries["avg_dep_delay"].astype("float64")
+    return queries
+
+
+def read_queries(path, chunksize=DEFAULT_BATCH_SIZE, sep=";"):
+    if _is_jsonl(path):
+        reader = pd.read_json(path, lines=True, chunksize=chunksize)
+    else:
+        reader = pd.read_csv(path, sep=sep, chunksize=chunksize)
+    for chunk in reader:
+        yield normalize_queries(chunk)
+
+
+def route_month_grid(feature_store, avg_dep_delay, chunksize=DEFAULT_BATCH_SIZE):
+    # Toutes les routes connues x 12 mois, pour un retard au départ donné
+    routes = feature_store.known_routes()
+    months = np.arange(1, 13)
+    step = max(1, chunksize // len(months))
+    for start in range(0, len(routes), step):
+        block = routes[start : start + step]
+        departures = np.repeat([d for d, _ in block], len(months))
+        arrivals = np.repeat([a for _, a in block], len(months))
+        yield pd.DataFrame(
+            {
+                "departure_station": departures,
+                "arrival_station": arrivals,
+                "month": np.tile(months, len(block)),
+                "avg_dep_delay": float(avg_dep_delay),
+            }
+        )
+
+
+def predict_frame(model, feature_store, queries):
+    X = feature_store.batch_frame(
+        queries["departure_station"],
+        queries["arrival_station"],
+        queries["month"],
+        queries["avg_dep_delay"],
+    )
+    result = queries.reset_index(drop=True)
+    # Comme le simulateur, un retard négatif est ramené à 0
+    result[PREDICTION_COLUMN] = np.maximum(0, model.predict(X))
+    return result
+
+
+def delay_sweep(model, feature_store, departure_station, arrival_station, delays=SWEEP_DELAYS):
+    # Grille (retard au départ x mois) d'un trajet : une seule matrice de
+    # features, un seul predict ; lignes = retards, colonnes = mois
+    queries = pd.DataFrame(
+        {
+            "departure_station": departure_station,
+            "arrival_station": arrival_station,
+            "month": np.tile(MONTHS, len(delays)),
+            "avg_dep_delay": np.repeat(np.asarray(delays, dtype="float64"), len(MONTHS)),
+        }
+    )
+    predictions = predict_frame(model, feature_store, queries)[PREDICTION_COLUMN].to_numpy()
+    return pd.DataFrame(
+        predictions.reshape(len(delays), len(MONTHS)),
+        index=pd.Index(delays, name="avg_dep_delay"),
+        columns=pd.Index(MONTHS, name="month"),
+    )
+
+
+def predict_batches(model, feature_store, chunks):
+    for queries in chunks:
+        if len(queries):
+            yield predict_frame(model, feature_store, queries)
+
+
+class PredictionCache:
+    # Cache LRU partagé entre sessions : clé (trajet, mois, retard arrondi,
+    # version du modèle). Un hit ne touche ni aux features ni à model.predict.
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def _put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def predict(
+        self, model, version, feature_store, departure_station, arrival_station, month, avg_dep_delay
+    ):
+        # Le retard est arrondi avant la prédiction : une clé = un résultat
+        avg_dep_delay = round(float(avg_dep_delay), DELAY_DECIMALS)
+        key = (departure_station, arrival_station, int(month), avg_dep_delay, version)
+        prediction = self._get(key)
+        if prediction is None:
+            if isinstance(model, tardis_inference.LightPredictor):
+                features = feature_store.simulator_features(
+                    departure_station, arrival_station, int(month), avg_dep_delay
+                )
+                prediction = max(0.0, float(model.predict_features(features)))
+            else:
+                X = feature_store.simulator_frame(
+                    departure_station, arrival_station, int(month), avg_dep_delay
+                )
+                prediction = max(0.0, float(model.predict(X)[0]))
+            self._put(key, prediction)
+        return prediction
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def write_predictions(batches, out):
+    # Écrit les lots au fil de l'eau (CSV ';' ou JSONL selon l'extension)
+    jsonl = isinstance(out, str) and _is_jsonl(out)
+    stream = sys.stdout if out in (None, "-") else open(out, "w", encoding="utf-8")
+    total = 0
+    try:
+        for i, batch in enumerate(batches):
+            if jsonl:
+                stream.write(batch.to_json(orient="records", lines=True, force_ascii=False))
+            else:
+                batch.to_csv(stream, sep=";", index=False, header=(i == 0))
+            total += len(batch)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Prédiction par lots du retard à l'arrivée (TARDIS)"
+    )
+    parser.add_argument("queries", nargs="?", help="Requêtes CSV (';') ou JSONL")
+    parser.add_argument("-o", "--output", default="-", help="Sortie CSV ou JSONL (défaut : stdout)")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default=tardis_store.CSV_PATH, help="Dataset nettoyé")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--sep", default=";", help="Séparateur du CSV de requêtes")
+    parser.add_argument("--grid", action="store_true", help="Scorer la grille routes x mois")
+    parser.add_argument("--avg-dep-delay", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    if not args.grid and not args.queries:
+        parser.error("indiquez un fichier de requêtes ou --grid")
+
+    model = load_model(args.model, light=False)
+    feature_store = tardis_features.FeatureStore.build(tardis_store.load_cleaned(args.data))
+
+    if args.grid:
+        chunks = route_month_grid(feature_store, args.avg_dep_delay, args.batch_size)
+    else:
+        chunks = read_queries(args.queries, args.batch_size, args.sep)
+
+    total = write_predictions(predict_batches(model, feature_store, chunks), args.output)
+    if args.output != "-":
+        print(f"✅ {total} prédictions écrites dans {os.path.abspath(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import os
+
+import pandas as pd
+
+import tardis_aggregates
+import tardis_reasons
+import tardis_store
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# --- Moteur SQL embarqué (optionnel) ---
+# Requêtes DuckDB directement sur le store (partitions Parquet, Parquet ou
+# CSV) au lieu de masques pandas sur le dataset entier chargé en mémoire :
+# les agrégats des pages sont calculés par le moteur avec les filtres
+# gare/année de la page poussés dans le scan, seul le résultat agrégé revient
+# côté Python. Le magasin de features et l'index des causes lisent encore
+# toutes les lignes, mais seulement les colonnes (et lignes commentées)
+# dont ils ont besoin.
+#
+#   engine = QueryEngine.open("cleaned_dataset.csv")
+#   engine.delay_totals(departure="paris nord")     # totaux d'un trajet
+#   engine.station_year_table("departure_station", year=2023)
+#   engine.top_reasons(departure="paris nord", n=3)
+
+TABLE_NAME = "trips"
+CALENDAR_COLUMNS = ["year", "month", "hour"]
+
+
+def is_available():
+    return duckdb is not None
+
+
+def _literal(path):
+    return "'" + path.replace("'", "''") + "'"
+
+
+def source_sql(csv_path=tardis_store.CSV_PATH):
+    # Même priorité que tardis_store.load_cleaned : partitions, Parquet, CSV
+    if tardis_store.has_partitions(csv_path):
+        manifest = tardis_store.read_manifest(csv_path)
+        paths = []
+        for key in sorted(manifest["partitions"]):
+            year, month = key.split("-")
+            path = tardis_store.partition_path(csv_path, year, month)
+            if os.path.exists(path):
+                paths.append(_literal(path))
+        if paths:
+            return f"read_parquet([{', '.join(paths)}], union_by_name = true)"
+    if tardis_store.is_store_fresh(csv_path):
+        return f"read_parquet({_literal(tardis_store.store_path(csv_path))})"
+    return f"read_csv({_literal(csv_path)}, delim = ';', header = true)"
+
+
+def _where(**filters):
+    # Un prédicat paramétré par filtre renseigné
+    clauses, params = [], []
+    for column, value in filters.items():
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    return ("WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+class QueryEngine:
+    def __init__(self, connection):
+        self.connection = connection
+        self.columns = [
+            row[0] for row in connection.execute(f"DESCRIBE {TABLE_NAME}").fetchall()
+        ]
+
+    @classmethod
+    def open(cls, csv_path=tardis_store.CSV_PATH):
+        if duckdb is None:
+            raise ImportError("duckdb n'est pas installé (pip install duckdb)")
+        connection = duckdb.connect()
+        source = source_sql(csv_path)
+        described = connection.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()
+        columns = [row[0] for row in described]
+        # Année et mois recalculés depuis la date, comme load_data() du dashboard
+        if "date" in columns:
+            select = [f'"{col}"' for col in columns if col not in CALENDAR_COLUMNS + ["date"]]
+            select += [
+                "CAST(date AS TIMESTAMP) AS date",
+                "CAST(year(date) AS INTEGER) AS year",
+                "CAST(month(date) AS INTEGER) AS month",
+            ]
+        else:
+            select = [f'"{col}"' for col in columns]
+        connection.execute(
+            f"CREATE VIEW {TABLE_NAME} AS SELECT {', '.join(select)} FROM {source}"
+        )
+        return cls(connection)
+
+    def query(self, sql, params=()):
+        # Un curseur par appel : le moteur est partagé entre les threads des sessions
+        return self.connection.cursor().execute(sql, list(params)).df()
+
+    def frame(self, columns, **filters):
+        # Projection (et filtres) poussés dans le scan
+        columns = [col for col in columns if col in self.columns]
+        where, params = _where(**filters)
+        select = ", ".join(f'"{col}"' for col in columns)
+        return self.query(f"SELECT {select} FROM {TABLE_NAME} {where}", params)
+
+    def aggregate(self, by, **filters):
+        # Mesures du cube (sommes, effectifs, ponctualité) regroupées par `by`
+        # et filtrées dans le scan ; by=[] renvoie une seule ligne de totaux
+        measures = []
+        for prefix, col in tardis_aggregates.DELAY_COLUMNS.items():
+            measures += [
+                f"coalesce(sum({col}), 0) AS {prefix}_sum",
+                f"count({col}) AS {prefix}_count",
+                f"coalesce(sum({col} * {col}), 0) AS {prefix}_sumsq",
+            ]
+        measures += [
+            'count(*) AS "rows"',
+            "count(*) FILTER (WHERE avg_arr_delay <= "
+            f"{tardis_aggregates.PUNCTUALITY_THRESHOLD}) AS punctual",
+        ]
+        where, params = _where(**filters)
+        if by:
+            keys = ", ".join(by)
+            sql = (
+                f"SELECT {keys}, {', '.join(measures)} FROM {TABLE_NAME} {where} "
+                f"GROUP BY {keys} ORDER BY {keys}"
+            )
+        else:
+            sql = f"SELECT {', '.join(measures)} FROM {TABLE_NAME} {where}"
+        table = self.query(sql, params)
+        for col in ["year", "month"]:
+            if col in table.columns:
+                table[col] = table[col].astype("int64")
+        return table
+
+    def cube(self, year=None):
+        # Même table que tardis_aggregates.build_cube, calculée par le moteur
+        return self.aggregate(tardis_aggregates.CUBE_KEYS, year=year)
+
+    def station_year_table(self, station_col, year=None):
+        # Même table que tardis_aggregates.station_year_table
+        return self.aggregate([station_col, "year"], year=year)
+
+    def delay_totals(self, departure=None, arrival=None):
+        # Totaux d'un trajet (ou d'une gare) pour tardis_aggregates.totals_stats
+        return self.aggregate([], departure_station=departure, arrival_station=arrival).iloc[0]
+
+    def years(self):
+        years = self.query(f"SELECT DISTINCT year FROM {TABLE_NAME} WHERE year IS NOT NULL")
+        return sorted(int(year) for year in years["year"])
+
+    def routes(self):
+        return self.query(
+            f"SELECT DISTINCT departure_station, arrival_station FROM {TABLE_NAME}"
+        )
+
+    def top_reasons(self, departure=None, arrival=None, n=3):
+        # Causes les plus fréquentes d'un trajet (équivalent de value_counts)
+        column = tardis_reasons.COMMENTS_COLUMN
+        if column not in self.columns:
+            return pd.Series(dtype="int64", name="count")
+        where, params = _where(departure_station=departure, arrival_station=arrival)
+        where = f"{where} AND" if where else "WHERE"
+        counts = self.query(
+            f"SELECT {column} AS reason, count(*) AS count FROM {TABLE_NAME} "
+            f"{where} {column} IS NOT NULL "
+            "GROUP BY reason ORDER BY count DESC, reason LIMIT ?",
+            params + [n],
+        )
+        return counts.set_index("reason")["count"].rename_axis(column)
+
+    def comment_rows(self):
+        # Seules les lignes commentées sont lues pour l'index des causes
+        column = tardis_reasons.COMMENTS_COLUMN
+        if column not in self.columns:
+            return pd.DataFrame(columns=["departure_station", "arrival_station", column])
+        columns = ["date", "departure_station", "arrival_station", column]
+        select = ", ".join(col for col in columns if col in self.columns)
+        return self.query(f"SELECT {select} FROM {TABLE_NAME} WHERE {column} IS NOT NULL")
@@ -0,0 +1,60 @@
+import pandas as pd
+
+# --- Causes de retard (commentaires libres) ---
+# Les commentaires d'arrivée contiennent une cause par ligne. On les éclate
+# une fois en table (date, gare de départ, gare d'arrivée, cause) : le
+# regroupement par date et l'index inversé cause -> dates/trajets en découlent.
+
+COMMENTS_COLUMN = "arrival_delay_comments"
+UNKNOWN_DATE = "Date inconnue"
+
+
+def explode_reasons(df):
+    rows = df.dropna(subset=[COMMENTS_COLUMN]).reset_index(drop=True)
+    if "date" in rows.columns:
+        dates = rows["date"].dt.strftime("%Y-%m-%d")
+    else:
+        dates = pd.Series(UNKNOWN_DATE, index=rows.index)
+
+    reasons = rows[COMMENTS_COLUMN].astype(str).str.split("\n").explode().str.strip()
+    exploded = pd.DataFrame(
+        {
+            "date": dates.loc[reasons.index].to_numpy(),
+            "departure_station": rows["departure_station"].loc[reasons.index].to_numpy(),
+            "arrival_station": rows["arrival_station"].loc[reasons.index].to_numpy(),
+            "reason": reasons.to_numpy(),
+        }
+    )
+    return exploded[exploded["reason"] != ""].reset_index(drop=True)
+
+
+def group_delay_reasons_by_date(df):
+    # date -> causes distinctes, dans l'ordre de première apparition
+    exploded = explode_reasons(df).drop_duplicates(["date", "reason"])
+    return exploded.groupby("date", sort=False)["reason"].agg(list).to_dict()
+
+
+def build_reason_index(df):
+    # Index inversé : une ligne par (cause, date, trajet), les lignes d'une
+    # même cause sont contiguës
+    return (
+        explode_reasons(df)
+        .drop_duplicates()
+        .sort_values(["reason", "date"], kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+def reason_slices(index):
+    # cause -> tranche de lignes dans l'index, triée par nombre d'occurrences
+    bounds = index.reset_index().groupby("reason", sort=False)["index"].agg(["min", "max"])
+    bounds["count"] = bounds["max"] - bounds["min"] + 1
+    bounds = bounds.sort_values("count", ascending=False, kind="stable")
+    return {
+        reason: slice(start, stop + 1)
+        for reason, start, stop in zip(bounds.index, bounds["min"], bounds["max"])
+    }
+
+
+def reason_occurrences(index, slices, reason):
+    return index.iloc[slices.get(reason, slice(0, 0))]
@@ -0,0 +1,199 @@
+import html
+import re
+
+import numpy as np
+import pandas as pd
+
+# --- Rendu HTML des cartes du dashboard ---
+# Chaque liste de cartes (classement, fiabilité) est construite en un seul
+# fragment HTML à partir des colonnes entières, au lieu d'un st.markdown par
+# carte : une liste = un seul élément envoyé au navigateur, quel que soit le
+# nombre de gares affichées. Les feuilles de style sont compactées une fois à
+# l'import.
+
+TOP_N_OPTIONS = [10, 50, 100]
+
+
+def _compact_css(css):
+    return re.sub(r"\s*([{}:;,])\s*", r"\1", re.sub(r"\s+", " ", css)).strip()
+
+
+RANKING_CSS = _compact_css(
+    """
+    .card {
+        border-radius: 10px;
+        padding: 15px;
+        margin: 10px 0;
+        box-shadow: 0 4px 8px 0 rgba(0,0,0,0.2);
+        transition: 0.3s;
+        display: flex;
+        flex-direction: column;
+    }
+    .card:hover {
+        box-shadow: 0 8px 16px 0 rgba(0,0,0,0.2);
+    }
+    .card-header {
+        display: flex;
+        align-items: center;
+        margin-bottom: 10px;
+    }
+    .gold {
+        background-color: #FFF9C4;
+        border-left: 5px solid #FFD700;
+    }
+    .silver {
+        background-color: #F5F5F5;
+        border-left: 5px solid #C0C0C0;
+    }
+    .bronze {
+        background-color: #FFECB3;
+        border-left: 5px solid #CD7F32;
+    }
+    .other {
+        background-color: #E3F2FD;
+        border-left: 5px solid #64B5F6;
+    }
+    .rank-1 {
+        font-size: 2.5rem;
+        font-weight: 900;
+        color: #FFD700;
+        margin-right: 15px;
+    }
+    .rank-2 {
+        font-size: 2.2rem;
+        font-weight: 700;
+        color: #C0C0C0;
+        margin-right: 15px;
+    }
+    .rank-3 {
+        font-size: 2rem;
+        font-weight: 600;
+        color: #CD7F32;
+        margin-right: 15px;
+    }
+    .rank-4 {
+        font-size: 1.8rem;
+        font-weight: 500;
+        color: #000000;
+        margin-right: 15px;
+    }
+    .station-name {
+        font-size: 1.5rem;
+        font-weight: bold;
+        color: #000000;
+    }
+    .delay-value {
+        font-size: 1.2rem;
+        color: #333;
+        margin-top: auto;
+        align-self: flex-start;
+    }
+    """
+)
+
+RELIABILITY_CSS = _compact_css(
+    """
+    .reliability-card {
+        border-radius: 10px;
+        padding: 20px;
+        margin: 10px 0;
+        box-shadow: 0 4px 8px 0 rgba(0,0,0,0.1);
+        background-color: #f8f9fa;
+        border-left: 5px solid #4CAF50;
+        display: flex;
+        flex-direction: column;
+        min-height: 140px;
+    }
+    .reliability-header {
+        display: flex;
+        align-items: center;
+        margin-bottom: 15px;
+    }
+    .reliability-stars {
+        font-size: 2rem;
+        color: #FFD700;
+        margin-right: 20px;
+    }
+    .reliability-station {
+        font-weight: bold;
+        font-size: 2rem;
+        color: #2c3e50;
+        line-height: 1.2;
+    }
+    .reliability-delay {
+        font-size: 1.4rem;
+        color: #7f8c8d;
+        margin-top: auto;
+        align-self: flex-start;
+    }
+    .reliability-columns {
+        display: grid;
+        grid-template-columns: repeat(2, 1fr);
+        gap: 20px;
+    }
+    @media (max-width: 768px) {
+        .reliability-columns {
+            grid-template-columns: 1fr;
+        }
+        .reliability-station {
+            font-size: 1.8rem;
+        }
+        .reliability-stars {
+            font-size: 1.8rem;
+        }
+        .reliability-delay {
+            font-size: 1.2rem;
+        }
+    }
+    """
+)
+
+
+def stylesheet(*css):
+    return "<style>" + "".join(css) + "</style>"
+
+
+def _text(values):
+    return pd.Series(values, dtype="object").astype(str).map(html.escape).reset_index(drop=True)
+
+
+def _delays(values):
+    return pd.Series(np.asarray(values, dtype="float64")).map("{:.1f}".format)
+
+
+def ranking_cards(stations, delays):
+    # Cartes du classement : or, argent, bronze puis les suivantes
+    ranks = np.arange(1, len(stations) + 1)
+    capped = np.minimum(ranks, 4)
+    rank_class = pd.Series(capped).astype(str)
+    card_class = pd.Series(np.array(["gold", "silver", "bronze", "other"])[capped - 1])
+    cards = (
+        '<div class="card '
+        + card_class
+        + '"><div class="card-header"><div class="rank-'
+        + rank_class
+        + '">'
+        + pd.Series(ranks).astype(str)
+        + '</div><div class="station-name">'
+        + _text(stations)
+        + '</div></div><div class="delay-value">Retard moyen: '
+        + _delays(delays)
+        + " min</div></div>"
+    )
+    return cards.str.cat()
+
+
+def reliability_cards(stations, delays, scores):
+    # Cartes de fiabilité dans une grille à deux colonnes
+    stars = pd.Series(np.char.multiply("⭐", np.asarray(scores, dtype="int64")))
+    cards = (
+        '<div class="reliability-card"><div class="reliability-header">'
+        '<div class="reliability-stars">'
+        + stars
+        + '</div><div class="reliability-station">'
+        + _text(stations)
+        + '</div></div><div class="reliability-delay">Retard moyen: '
+        + _delays(delays)
+        + " min</div></div>"
+    )
+    return '<div class="reliability-columns">' + cards.str.cat() + "</div>"
@@ -0,0 +1,357 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+import tardis_features
+import tardis_predict
+import tardis_store
+
+# --- Service HTTP de prédiction ---
+# Petit serveur asyncio (bibliothèque standard uniquement) qui charge une fois
+# le modèle et le magasin de features. Les requêtes concurrentes sont
+# regroupées en micro-lots pendant une courte fenêtre, puis servies par un
+# seul predict vectorisé exécuté hors de la boucle d'événements.
+#
+#   python tardis_service.py --port 8765
+#   curl -X POST localhost:8765/predict -d '{"departure_station": "paris lyon",
+#        "arrival_station": "marseille st charles", "month": 7, "avg_dep_delay": 5}'
+#   curl localhost:8765/stats
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+BATCH_WINDOW_MS = 5
+MAX_BATCH_SIZE = 1024
+STATS_WINDOW = 10_000
+MAX_BODY_SIZE = 1_000_000
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+class RequestError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_query(payload):
+    # Une requête = un objet JSON avec les colonnes de tardis_predict
+    if not isinstance(payload, dict):
+        raise RequestError("chaque requête doit être un objet JSON")
+    aliases = tardis_predict.QUERY_ALIASES
+    payload = {aliases.get(key, key): value for key, value in payload.items()}
+    missing = [col for col in tardis_predict.QUERY_COLUMNS if col not in payload]
+    if missing:
+        raise RequestError(f"champs manquants : {', '.join(missing)}")
+    try:
+        month = int(payload["month"])
+        avg_dep_delay = float(payload["avg_dep_delay"])
+    except (TypeError, ValueError):
+        raise RequestError("month et avg_dep_delay doivent être numériques")
+    if not 1 <= month <= 12:
+        raise RequestError("month doit être compris entre 1 et 12")
+    if not np.isfinite(avg_dep_delay):
+        raise RequestError("avg_dep_delay doit être un nombre fini")
+    return (
+        str(payload["departure_station"]).lower().strip(),
+        str(payload["arrival_station"]).lower().strip(),
+        month,
+        avg_dep_delay,
+    )
+
+
+class ServiceStats:
+    # Fenêtres glissantes des latences (ms) et des tailles de lots
+    def __init__(self, window=STATS_WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.started = time.time()
+
+    def record_batch(self, size):
+        self.batches += 1
+        self.batch_sizes.append(size)
+
+    def record_request(self, latency_ms):
+        self.requests += 1
+        self.latencies.append(latency_ms)
+
+    def snapshot(self):
+        latencies = np.asarray(self.latencies, dtype="float64")
+        sizes = np.asarray(self.batch_sizes, dtype="int64")
+        stats = {
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batches,
+            "uptime_s": round(time.time() - self.started, 1),
+            "latency_ms": None,
+            "batch_size": None,
+        }
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            stats["latency_ms"] = {
+                "p50": round(p50, 3),
+                "p95": round(p95, 3),
+                "p99": round(p99, 3),
+                "max": round(latencies.max(), 3),
+            }
+        if len(sizes):
+            stats["batch_size"] = {
+                "mean": round(sizes.mean(), 2),
+                "p50": int(np.percentile(sizes, 50)),
+                "max": int(sizes.max()),
+            }
+        return stats
+
+
+class MicroBatcher:
+    def __init__(
+        self, model, feature_store, stats, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH_SIZE
+    ):
+        self.model = model
+        self.feature_store = feature_store
+        self.stats = stats
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def predict(self, queries):
+        loop = asyncio.get_running_loop()
+        futures = []
+        for query in queries:
+            future = loop.create_future()
+            self._queue.put_nowait((query, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def _collect(self):
+        # Premier élément attendu sans limite, les suivants pendant la fenêtre
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    def _predict_batch(self, queries):
+        frame = pd.DataFrame(queries, columns=tardis_predict.QUERY_COLUMNS)
+        result = tardis_predict.predict_frame(self.model, self.feature_store, frame)
+        return result[tardis_predict.PREDICTION_COLUMN].astype("float64").tolist()
+
+    def _predict_each(self, queries):
+        results = []
+        for query in queries:
+            try:
+                results.append(self._predict_batch([query])[0])
+            except Exception as error:
+                results.append(error)
+        return results
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            queries = [query for query, _ in batch]
+            try:
+                # predict hors de la boucle : les requêtes suivantes continuent d'arriver
+                predictions = await loop.run_in_executor(None, self._predict_batch, queries)
+            except Exception:
+                # Une requête invalide ne doit pas faire échouer tout le lot :
+                # chaque requête est rejouée seule, seules les fautives échouent
+                predictions = await loop.run_in_executor(None, self._predict_each, queries)
+            self.stats.record_batch(len(batch))
+            for (_, future), prediction in zip(batch, predictions):
+                if future.done():
+                    continue
+                if isinstance(prediction, Exception):
+                    self.stats.errors += 1
+                    future.set_exception(prediction)
+                else:
+                    future.set_result(prediction)
+
+
+class PredictionService:
+    def __init__(
+        self,
+        model,
+        feature_store,
+        model_version="",
+        data_version="",
+        window_ms=BATCH_WINDOW_MS,
+        max_batch=MAX_BATCH_SIZE,
+    ):
+        self.stats = ServiceStats()
+        self.batcher = MicroBatcher(model, feature_store, self.stats, window_ms, max_batch)
+        self.model_version = model_version
+        self.data_version = data_version
+
+    @classmethod
+    def from_files(
+        cls, model_path=tardis_predict.MODEL_PATH, csv_path=tardis_store.CSV_PATH, **kwargs
+    ):
+        model = tardis_predict.load_model(model_path, light=False)
+        feature_store = tardis_features.FeatureStore.build(tardis_store.load_cleaned(csv_path))
+        return cls(
+            model,
+            feature_store,
+            tardis_predict.model_version(model_path),
+            tardis_store.data_version(csv_path),
+            **kwargs,
+        )
+
+    async def handle(self, method, path, body):
+        # Renvoie (statut, objet JSON)
+        if path == "/health":
+            return 200, {
+                "status": "ok",
+                "model_version": self.model_version,
+                "data_version": self.data_version,
+            }
+        if path == "/stats":
+            return 200, self.stats.snapshot()
+        if path != "/predict":
+            raise RequestError(f"chemin inconnu : {path}", 404)
+        if method != "POST":
+            raise RequestError("utilisez POST pour /predict", 405)
+
+        start = time.perf_counter()
+        try:
+            payload = json.loads(body or b"null")
+        except json.JSONDecodeError:
+            raise RequestError("corps JSON invalide")
+        # Un objet -> une prédiction ; une liste d'objets -> une liste
+        many = isinstance(payload, list)
+        queries = [parse_query(item) for item in (payload if many else [payload])]
+        predictions = await self.batcher.predict(queries)
+        self.stats.record_request((time.perf_counter() - start) * 1000)
+
+        column = tardis_predict.PREDICTION_COLUMN
+        if many:
+            return 200, [{column: prediction} for prediction in predictions]
+        return 200, {column: predictions[0]}
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise RequestError("ligne de requête invalide")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise RequestError("en-tête Content-Length invalide")
+        if length < 0:
+            raise RequestError("en-tête Content-Length invalide")
+        if length > MAX_BODY_SIZE:
+            raise RequestError("corps trop volumineux")
+        body = await reader.readexactly(length) if length else b""
+        keep_alive = headers.get("connection", "").lower() != "close"
+        return method.upper(), target.split("?", 1)[0], body, keep_alive
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, body, keep_alive = request
+                    status, payload = await self.handle(method, path, body)
+                except RequestError as error:
+                    self.stats.errors += 1
+                    status, payload = error.status, {"error": str(error)}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as error:
+                    self.stats.errors += 1
+                    status, payload = 500, {"error": f"{type(error).__name__}: {error}"}
+
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Internal Server Error')}\r\n"
+                        "Content-Type: application/json; charset=utf-8\r\n"
+                        f"Content-Length: {len(data)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    ).encode("latin-1")
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+        self.batcher.start()
+        server = await asyncio.start_server(self._serve_connection, host, port)
+        if ready is not None:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Service HTTP de prédiction TARDIS")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--model", default=tardis_predict.MODEL_PATH)
+    parser.add_argument("--data", default=tardis_store.CSV_PATH, help="Dataset nettoyé")
+    parser.add_argument("--window-ms", type=float, default=BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    service = PredictionService.from_files(
+        args.model, args.data, window_ms=args.window_ms, max_batch=args.max_batch
+    )
+
+    def ready(server):
+        address = server.sockets[0].getsockname()
+        print(f"✅ Service de prédiction à l'écoute sur http://{address[0]}:{address[1]}")
+
+    try:
+        asyncio.run(service.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+from rapidfuzz import distance, process
+
+# --- Normalisation des noms de gares ---
+# Index des gares officielles par longueur de nom, construit une seule fois,
+# et mémo des noms bruts déjà résolus : le coût du nettoyage dépend du nombre
+# de noms distincts (quelques centaines), pas du nombre de lignes.
+
+GARES_PATH = "liste-des-gares.csv"
+
+
+def normalize_names(names):
+    return names.str.lower().str.strip().str.replace("-", " ")
+
+
+def load_gares(path=GARES_PATH):
+    gares = pd.read_csv(path, sep=";")
+    gares["LIBELLE"] = normalize_names(gares["LIBELLE"])
+    return gares
+
+
+class StationMatcher:
+    def __init__(self, gares_valides, villes_valides=(), max_distance=None):
+        self.gares_valides = {g for g in gares_valides if isinstance(g, str)}
+        self.villes_valides = set(villes_valides)
+        # max_distance=None : comme le notebook, la gare de même longueur la
+        # plus proche est toujours retenue
+        self.max_distance = max_distance
+        self.buckets = {}
+        for gare in sorted(self.gares_valides):
+            self.buckets.setdefault(len(gare), []).append(gare)
+        self.memo = {}
+
+    @classmethod
+    def from_gares(cls, gares, villes_valides=(), max_distance=None):
+        return cls(gares["LIBELLE"].unique(), villes_valides, max_distance)
+
+    def _is_valid_name(self, name):
+        return isinstance(name, str) and name.strip() != ""
+
+    def resolve(self, names):
+        # Résout en lot les noms absents du mémo, par paquet de même longueur
+        pending = {}
+        for name in names:
+            if name in self.memo:
+                continue
+            if not self._is_valid_name(name):
+                self.memo[name] = np.nan
+            elif name in self.gares_valides or name in self.villes_valides:
+                self.memo[name] = name
+            else:
+                pending.setdefault(len(name), []).append(name)
+
+        for length, queries in pending.items():
+            candidates = self.buckets.get(length)
+            if not candidates:
+                self.memo.update(dict.fromkeys(queries, np.nan))
+                continue
+            scores = process.cdist(
+                queries,
+                candidates,
+                scorer=distance.Levenshtein.distance,
+                score_cutoff=self.max_distance,
+                workers=-1,
+            )
+            best = scores.argmin(axis=1)
+            for query, idx, row in zip(queries, best, scores):
+                if self.max_distance is not None and row[idx] > self.max_distance:
+                    self.memo[query] = np.nan
+                else:
+                    self.memo[query] = candidates[idx]
+
+    def match(self, name):
+        self.resolve([name])
+        return self.memo[name]
+
+    def clean(self, series):
+        uniques = series.dropna().unique()
+        self.resolve(uniques)
+        return series.map(self.memo)
@@ -0,0 +1,322 @@
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# --- Stockage colonnaire du dataset nettoyé ---
+# Le notebook EDA écrit un fichier Parquet à côté de cleaned_dataset.csv :
+# les dates et les gares y sont déjà typées, le dashboard n'a plus rien à
+# re-parser au démarrage. Le CSV reste la source de repli.
+
+CSV_PATH = "cleaned_dataset.csv"
+
+CATEGORY_COLUMNS = ["departure_station", "arrival_station", "route"]
+
+# Mode mémoire compact : compteurs en entiers courts, retards et pourcentages
+# en float32
+COUNT_COLUMNS = [
+    "scheduled_trains",
+    "cancelled_trains",
+    "trains_delayed_dep",
+    "trains_delayed_arr",
+    "trains_delayed_15min",
+    "trains_delayed_30min",
+    "trains_delayed_60min",
+    "trains_arrives",
+]
+FLOAT32_COLUMNS = [
+    "avg_dep_delay",
+    "avg_arr_delay",
+    "pct_delay_external",
+    "pct_delay_infrastructure",
+    "pct_delay_traffic_mgmt",
+    "pct_delay_rolling_stock",
+    "pct_delay_station_mgmt",
+    "pct_delay_passenger",
+]
+CALENDAR_COLUMNS = {"month": "int8", "hour": "int8", "year": "int16"}
+
+
+def store_path(csv_path=CSV_PATH):
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def prepare_types(df):
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"])
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def frame_memory(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def _count_dtype(values):
+    # int16/int32 si la colonne est entière et complète, sinon float32
+    if values.isna().any() or not (values % 1 == 0).all():
+        return "float32"
+    if values.abs().max() <= np.iinfo(np.int16).max:
+        return "int16"
+    return "int32"
+
+
+def compact(df):
+    # Conversion en place ; renvoie la mémoire occupée avant/après (octets)
+    before = frame_memory(df)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    for col in COUNT_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(_count_dtype(df[col]))
+    for col in FLOAT32_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("float32")
+    for col, dtype in CALENDAR_COLUMNS.items():
+        if col in df.columns and df[col].notna().all():
+            df[col] = df[col].astype(dtype)
+    return {"before": before, "after": frame_memory(df)}
+
+
+def is_store_fresh(csv_path=CSV_PATH):
+    # Le store est périmé s'il est absent ou plus ancien que le CSV
+    store = store_path(csv_path)
+    if not os.path.exists(store):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return os.path.getmtime(store) >= os.path.getmtime(csv_path)
+
+
+def write_store(df, csv_path=CSV_PATH):
+    typed = prepare_types(df.copy())
+    try:
+        typed.to_parquet(store_path(csv_path), index=False)
+    except ImportError:
+        # pyarrow absent : le dashboard se contentera du CSV
+        return None
+    return store_path(csv_path)
+
+
+# --- Store partitionné par mois (mises à jour incrémentales) ---
+# cleaned_dataset/year=YYYY/month=MM/{data,cube}.parquet + manifest.json.
+# Chaque mois est une partition remplaçable indépendamment ; le manifeste
+# porte la version exposée au dashboard.
+
+MANIFEST_NAME = "manifest.json"
+DATA_PART = "data.parquet"
+CUBE_PART = "cube.parquet"
+
+# Partitions déjà lues par ce processus : (chemin, version de la partition
+# dans le manifeste) -> DataFrame
+_partition_cache = {}
+
+
+def partitions_dir(csv_path=CSV_PATH):
+    return os.path.splitext(csv_path)[0]
+
+
+def manifest_path(csv_path=CSV_PATH):
+    return os.path.join(partitions_dir(csv_path), MANIFEST_NAME)
+
+
+def partition_key(year, month):
+    return f"{int(year):04d}-{int(month):02d}"
+
+
+def partition_path(csv_path, year, month, name=DATA_PART):
+    return os.path.join(
+        partitions_dir(csv_path), f"year={int(year):04d}", f"month={int(month):02d}", name
+    )
+
+
+def has_partitions(csv_path=CSV_PATH):
+    # Le store partitionné prime tant qu'il n'est pas plus ancien que le CSV
+    manifest = manifest_path(csv_path)
+    if not os.path.exists(manifest):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    return os.path.getmtime(manifest) >= os.path.getmtime(csv_path)
+
+
+def read_manifest(csv_path=CSV_PATH):
+    if not os.path.exists(manifest_path(csv_path)):
+        return {"version": 0, "partitions": {}}
+    with open(manifest_path(csv_path), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _atomic_write(path, write):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def write_manifest(manifest, csv_path=CSV_PATH):
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+
+    _atomic_write(manifest_path(csv_path), write)
+
+
+def write_partition(df, csv_path, year, month, name=DATA_PART):
+    path = partition_path(csv_path, year, month, name)
+    _atomic_write(path, lambda tmp: df.to_parquet(tmp, index=False))
+    return path
+
+
+def load_partitions(csv_path=CSV_PATH, name=DATA_PART):
+    # Seules les partitions dont la version a changé depuis la dernière
+    # lecture sont relues : ajouter un mois ne relit que ce mois
+    manifest = read_manifest(csv_path)
+    current = set()
+    frames = []
+    for key in sorted(manifest["partitions"]):
+        year, month = key.split("-")
+        path = partition_path(csv_path, year, month, name)
+        if os.path.exists(path):
+            cache_key = (path, manifest["partitions"][key].get("version"))
+            if cache_key not in _partition_cache:
+                _partition_cache[cache_key] = pd.read_parquet(path)
+            current.add(cache_key)
+            frames.append(_partition_cache[cache_key])
+    # Versions remplacées et mois retirés du manifeste : la mémoire reste
+    # bornée par les partitions courantes
+    root = partitions_dir(csv_path)
+    for cache_key in list(_partition_cache):
+        path = cache_key[0]
+        if (
+            cache_key not in current
+            and os.path.basename(path) == name
+            and path.startswith(root + os.sep)
+        ):
+            del _partition_cache[cache_key]
+    if not frames:
+        return None
+    return prepare_types(pd.concat(frames, ignore_index=True))
+
+
+def read_csv(csv_path=CSV_PATH):
+    return prepare_types(pd.read_csv(csv_path, sep=";"))
+
+
+def load_cleaned(csv_path=CSV_PATH, partitions=True):
+    if partitions and has_partitions(csv_path):
+        df = load_partitions(csv_path)
+        if df is not None:
+            return df
+    if is_store_fresh(csv_path):
+        try:
+            # Les stores écrits par morceaux n'ont pas de métadonnées pandas
+            return prepare_types(pd.read_parquet(store_path(csv_path)))
+        except (ImportError, OSError, ValueError):
+            pass
+    return read_csv(csv_path)
+
+
+def data_version(csv_path=CSV_PATH):
+    # Identifiant de version utilisé comme clé des caches du dashboard
+    if has_partitions(csv_path):
+        return f"partitions:{read_manifest(csv_path)['version']}"
+    path = store_path(csv_path) if is_store_fresh(csv_path) else csv_path
+    if not os.path.exists(path):
+        return "absent"
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+# --- Store mappé en mémoire, partagé entre processus ---
+# cleaned_dataset.mmap/<version>[-<variante>]/ : un fichier .npy par colonne,
+# les colonnes texte (gares, commentaires) encodées en dictionnaire (codes
+# entiers mappés + valeurs dans columns.json), relues en catégories.
+# Le premier processus publie le dataset prêt à l'emploi, les suivants ouvrent
+# les fichiers en lecture seule (np.load(mmap_mode="r")) : les pages sont
+# partagées par le cache du noyau, sans copie par processus ni par rerun.
+
+MMAP_SUFFIX = ".mmap"
+MMAP_LAYOUT = "columns.json"
+
+
+def _mmap_name(version, variant=None):
+    # <version>[-<variante>] : les variantes (mode compact...) d'une même
+    # version des données coexistent
+    name = re.sub(r"[^\w.-]", "_", version)
+    return f"{name}-{variant}" if variant else name
+
+
+def mmap_dir(csv_path=CSV_PATH, version=None, variant=None):
+    root = os.path.splitext(csv_path)[0] + MMAP_SUFFIX
+    if version is None:
+        return root
+    return os.path.join(root, _mmap_name(version, variant))
+
+
+def _is_raw_column(values):
+    # Nombres, booléens et dates se mappent tels quels
+    return isinstance(values.dtype, np.dtype) and values.dtype.kind in "biufM"
+
+
+def publish_mmap(df, version, csv_path=CSV_PATH, variant=None):
+    target = mmap_dir(csv_path, version, variant)
+    if os.path.exists(os.path.join(target, MMAP_LAYOUT)):
+        return target
+    tmp = f"{target}.tmp-{os.getpid()}"
+    os.makedirs(tmp, exist_ok=True)
+    layout = []
+    for i, col in enumerate(df.columns):
+        values = df[col]
+        entry = {"name": col, "file": f"{i}.npy"}
+        if _is_raw_column(values):
+            array = values.to_numpy()
+        else:
+            categorical = pd.Categorical(values)
+            entry["categories"] = categorical.categories.astype(str).tolist()
+            array = categorical.codes
+        np.save(os.path.join(tmp, entry["file"]), array, allow_pickle=False)
+        layout.append(entry)
+    with open(os.path.join(tmp, MMAP_LAYOUT), "w", encoding="utf-8") as f:
+        json.dump(layout, f, ensure_ascii=False)
+
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        # Un autre processus a publié la même version entre-temps
+        shutil.rmtree(tmp, ignore_errors=True)
+    # Versions précédentes des données, toutes variantes : les processus qui
+    # les ont ouvertes gardent leurs pages. Les autres variantes de la version
+    # courante servent aux processus d'une autre configuration.
+    current = _mmap_name(version)
+    for name in os.listdir(mmap_dir(csv_path)):
+        if name == current or name.startswith(f"{current}-") or ".tmp-" in name:
+            continue
+        shutil.rmtree(os.path.join(mmap_dir(csv_path), name), ignore_errors=True)
+    return target
+
+
+def load_mmap(version, csv_path=CSV_PATH, variant=None):
+    directory = mmap_dir(csv_path, version, variant)
+    if not os.path.exists(os.path.join(directory, MMAP_LAYOUT)):
+        return None
+    with open(os.path.join(directory, MMAP_LAYOUT), encoding="utf-8") as f:
+        layout = json.load(f)
+    columns = {}
+    for entry in layout:
+        array = np.load(os.path.join(directory, entry["file"]), mmap_mode="r")
+        if "categories" not in entry:
+            columns[entry["name"]] = array
+            continue
+        # Gares et textes libres : les codes restent mappés, seules les valeurs
+        # distinctes sont propres au processus (code -1 = valeur manquante)
+        columns[entry["name"]] = pd.Categorical.from_codes(
+            array, dtype=pd.CategoricalDtype(entry["categories"]), validate=False
+        )
+    return pd.DataFrame(columns, copy=False)
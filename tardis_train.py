@@ -0,0 +1,278 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import KFold, ParameterGrid, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from xgboost import XGBRegressor
+
+import tardis_features
+import tardis_inference
+import tardis_predict
+import tardis_store
+
+# --- Entraînement et recherche d'hyperparamètres ---
+# Reprend la préparation de tardis_model.ipynb, mais le ColumnTransformer est
+# ajusté une seule fois : la matrice creuse obtenue (one-hot des trajets +
+# variables standardisées) sert à tous les candidats. Chaque configuration
+# est évaluée en validation croisée dans un pool de processus dont le nombre
+# de cœurs est fixé à l'avance (processus x threads par modèle <= --cpus).
+# Les scores sont mis en cache sur disque par empreinte des données et des
+# paramètres : une nouvelle exécution saute les configurations déjà évaluées.
+#
+#   python tardis_train.py --cpus 8 --workers 4
+#   python tardis_train.py --models xgboost --folds 5 -o tardis_best_model.pkl
+
+TARGET = "avg_arr_delay"
+TARGET_MAX = 30
+TEST_SIZE = 0.14
+RANDOM_STATE = 42
+DEFAULT_FOLDS = 3
+CACHE_DIR = "experiments"
+
+CATEGORICAL_FEATURES = ["route"]
+SCALED_FEATURES = [
+    "avg_dep_delay",
+    "total_delay_points",
+    "trains_delayed_15min",
+    "trains_delayed_30min",
+    "trains_delayed_60min",
+]
+
+# Grilles de recherche ; les paramètres du notebook en font partie
+MODELS = {
+    "random_forest": RandomForestRegressor,
+    "xgboost": XGBRegressor,
+}
+SEARCH_SPACES = {
+    "random_forest": {
+        "n_estimators": [300],
+        "max_depth": [10, 15],
+        "min_samples_split": [5],
+        "max_features": ["sqrt"],
+        "random_state": [RANDOM_STATE],
+    },
+    "xgboost": {
+        "n_estimators": [300, 500],
+        "max_depth": [5, 7],
+        "learning_rate": [0.05, 0.1],
+        "subsample": [0.8],
+        "colsample_bytree": [0.8],
+        "random_state": [RANDOM_STATE],
+    },
+}
+
+
+def make_preprocessor():
+    return ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_FEATURES),
+            ("num", StandardScaler(), SCALED_FEATURES),
+        ],
+        remainder="passthrough",
+        # Toujours creuse, même avec peu de trajets : la recherche et
+        # l'empreinte des données lisent une matrice CSR
+        sparse_threshold=1.0,
+    )
+
+
+def prepare_data(df):
+    # Mêmes filtres que le notebook : cible présente et réaliste (0-30 min)
+    df = tardis_features.add_model_features(df)
+    features = list(tardis_features.MODEL_FEATURES)
+    df = df.dropna(subset=[TARGET] + features)
+    df = df[(df[TARGET] >= 0) & (df[TARGET] <= TARGET_MAX)]
+    return df[features], df[TARGET]
+
+
+def make_model(name, params, threads):
+    # Le nombre de threads est imposé par le budget de cœurs, jamais -1
+    return MODELS[name](**params, n_jobs=threads)
+
+
+# --- Cache des expériences ---
+def data_fingerprint(X, y, folds):
+    digest = hashlib.sha256()
+    for array in (X.data, X.indices, X.indptr, np.asarray(X.shape), np.asarray(y)):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update(f"folds={folds}:seed={RANDOM_STATE}".encode())
+    return digest.hexdigest()
+
+
+def experiment_key(fingerprint, name, params):
+    payload = json.dumps({"data": fingerprint, "model": name, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _cache_file(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def read_cached(cache_dir, key):
+    path = _cache_file(cache_dir, key)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_cached(cache_dir, key, result):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = _cache_file(cache_dir, key) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=1, sort_keys=True)
+    os.replace(tmp, _cache_file(cache_dir, key))
+
+
+# --- Évaluation dans les processus du pool ---
+# La matrice d'entraînement est transmise une fois par processus (initializer)
+# et non à chaque configuration
+_worker_data = {}
+
+
+def _init_worker(X, y, folds):
+    _worker_data.update(X=X, y=y, folds=folds)
+
+
+def evaluate(name, params, threads):
+    X, y, folds = _worker_data["X"], _worker_data["y"], _worker_data["folds"]
+    maes, r2s = [], []
+    start = time.perf_counter()
+    splits = KFold(folds, shuffle=True, random_state=RANDOM_STATE).split(y)
+    for train_index, valid_index in splits:
+        model = make_model(name, params, threads)
+        model.fit(X[train_index], y[train_index])
+        pred = model.predict(X[valid_index])
+        maes.append(mean_absolute_error(y[valid_index], pred))
+        r2s.append(r2_score(y[valid_index], pred))
+    return {
+        "model": name,
+        "params": params,
+        "folds": folds,
+        "mae": float(np.mean(maes)),
+        "mae_std": float(np.std(maes)),
+        "r2": float(np.mean(r2s)),
+        "fit_s": time.perf_counter() - start,
+    }
+
+
+def core_budget(cpus, workers, tasks):
+    # workers processus x threads par modèle, dans la limite de cpus cœurs
+    cpus = max(1, cpus or os.cpu_count() or 1)
+    workers = max(1, min(workers or cpus, cpus, max(tasks, 1)))
+    return workers, max(1, cpus // workers)
+
+
+def search(
+    X, y, models=tuple(MODELS), folds=DEFAULT_FOLDS, cpus=None, workers=None, cache_dir=CACHE_DIR
+):
+    fingerprint = data_fingerprint(X, y, folds)
+    results, pending = [], []
+    for name in models:
+        for params in ParameterGrid(SEARCH_SPACES[name]):
+            key = experiment_key(fingerprint, name, params)
+            cached = read_cached(cache_dir, key)
+            if cached is not None:
+                results.append({**cached, "cached": True})
+            else:
+                pending.append((key, name, params))
+    print(f"⏱ {len(pending)} configurations à évaluer, {len(results)} en cache", file=sys.stderr)
+
+    workers, threads = core_budget(cpus, workers, len(pending))
+    if pending:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(X, y, folds)
+        ) as pool:
+            futures = {
+                pool.submit(evaluate, name, params, threads): key
+                for key, name, params in pending
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                write_cached(cache_dir, futures[future], result)
+                results.append({**result, "cached": False})
+                print(
+                    f"✅ {result['model']} {result['params']} : MAE {result['mae']:.3f} "
+                    f"({result['fit_s']:.1f} s)",
+                    file=sys.stderr,
+                )
+    return sorted(results, key=lambda r: r["mae"])
+
+
+def train(
+    df, models=tuple(MODELS), folds=DEFAULT_FOLDS, cpus=None, workers=None, cache_dir=CACHE_DIR
+):
+    X, y = prepare_data(df)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE
+    )
+    # Ajusté une fois sur l'échantillon d'entraînement, partagé par tous les candidats
+    preprocessor = make_preprocessor().fit(X_train)
+    X_train_matrix = preprocessor.transform(X_train).tocsr()
+    y_train_values = y_train.to_numpy(dtype="float64")
+
+    results = search(X_train_matrix, y_train_values, models, folds, cpus, workers, cache_dir)
+    best = results[0]
+
+    # Modèle final : même pipeline que le notebook, réentraîné avec tous les cœurs
+    regressor = make_model(best["model"], best["params"], core_budget(cpus, 1, 1)[1])
+    regressor.fit(X_train_matrix, y_train_values)
+    pipeline = Pipeline([("preprocessor", preprocessor), ("regressor", regressor)])
+    pred = pipeline.predict(X_test)
+    evaluation = {
+        "model": best["model"],
+        "params": best["params"],
+        "r2": float(r2_score(y_test, pred)),
+        "mae": float(mean_absolute_error(y_test, pred)),
+    }
+    return pipeline, results, evaluation
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entraînement des modèles TARDIS")
+    parser.add_argument("--data", default=tardis_store.CSV_PATH)
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS))
+    parser.add_argument("--folds", type=int, default=DEFAULT_FOLDS)
+    parser.add_argument("--cpus", type=int, help="Cœurs alloués (défaut : tous)")
+    parser.add_argument("--workers", type=int, help="Processus d'évaluation (défaut : --cpus)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("-o", "--output", default=tardis_predict.MODEL_PATH)
+    args = parser.parse_args(argv)
+
+    # Même source que les autres points d'entrée : store partitionné ou Parquet
+    # s'ils sont à jour, sinon le CSV
+    df = tardis_store.load_cleaned(args.data)
+    pipeline, results, evaluation = train(
+        df, args.models, args.folds, args.cpus, args.workers, args.cache_dir
+    )
+    for result in results:
+        origin = "cache" if result["cached"] else f"{result['fit_s']:.1f} s"
+        print(
+            f"{result['mae']:8.3f}  {result['r2']:6.3f}  {result['model']:<14} "
+            f"{result['params']} ({origin})"
+        )
+    print(f"\n=== {evaluation['model']} (test) ===")
+    print(f"R²: {evaluation['r2']:.3f}")
+    print(f"MAE: {evaluation['mae']:.2f} min")
+
+    joblib.dump(pipeline, args.output)
+    print(f"💾 Modèle sauvegardé dans {args.output}")
+    if evaluation["model"] == "xgboost":
+        directory = tardis_inference.export_artifact(
+            pipeline, tardis_inference.artifact_path(args.output)
+        )
+        print(f"💾 Artefact d'inférence exporté dans {directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import time
+
+import pandas as pd
+
+import tardis_aggregates
+import tardis_cleaning
+import tardis_store
+
+# --- Mise à jour incrémentale mensuelle ---
+# Les données SNCF arrivent mois par mois. Au lieu de relancer tout le
+# notebook, on nettoie uniquement le nouveau mois, on remplace sa partition
+# dans le store partitionné et on recalcule la tranche correspondante du cube
+# d'agrégats. Le manifeste est ensuite publié avec une nouvelle version.
+#
+#   python tardis_update.py init                       # une fois, depuis cleaned_dataset.csv
+#   python tardis_update.py append export_2024_07.csv --month 2024-07
+
+
+def _month_slices(df):
+    years = df["date"].dt.year
+    months = df["date"].dt.month
+    for (year, month), index in df.groupby([years, months], sort=True).groups.items():
+        yield int(year), int(month), df.loc[index]
+
+
+def write_months(df, csv_path=tardis_store.CSV_PATH):
+    # Écrit (données + tranche du cube) les mois présents dans df, puis publie
+    # le manifeste. Les autres partitions ne sont pas touchées.
+    manifest = tardis_store.read_manifest(csv_path)
+    manifest["version"] += 1
+    written = []
+    for year, month, part in _month_slices(df):
+        part = part.reset_index(drop=True)
+        part["month"] = month
+        part["year"] = year
+        tardis_store.write_partition(part, csv_path, year, month)
+        cube = tardis_aggregates.build_cube(part)
+        tardis_store.write_partition(cube, csv_path, year, month, tardis_store.CUBE_PART)
+
+        key = tardis_store.partition_key(year, month)
+        manifest["partitions"][key] = {
+            "rows": len(part),
+            "cube_rows": len(cube),
+            "version": manifest["version"],
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        written.append(key)
+    # Publié en dernier : le dashboard ne voit la nouvelle version qu'une fois
+    # toutes les partitions écrites
+    tardis_store.write_manifest(manifest, csv_path)
+    return written, manifest["version"]
+
+
+def init_partitions(csv_path=tardis_store.CSV_PATH):
+    df = tardis_store.load_cleaned(csv_path, partitions=False)
+    return write_months(df, csv_path)
+
+
+def clean_month(raw_path, month=None, matcher=None, chunksize=tardis_cleaning.DEFAULT_CHUNKSIZE):
+    # Nettoie l'export brut du nouveau mois avec le pipeline par morceaux
+    if matcher is None:
+        matcher = tardis_cleaning.default_matcher()
+    report = tardis_cleaning.new_report()
+    chunks = tardis_cleaning.clean_chunks(
+        tardis_cleaning.read_raw_chunks(raw_path, chunksize), matcher, report
+    )
+    frames = list(chunks)
+    df = (
+        pd.concat(frames, ignore_index=True)
+        if frames
+        else pd.DataFrame(columns=tardis_cleaning.OUTPUT_COLUMNS)
+    )
+    if month is not None:
+        period = pd.Period(month, freq="M")
+        df = df[(df["date"].dt.year == period.year) & (df["date"].dt.month == period.month)]
+    return df, report
+
+
+def append_month(raw_path, csv_path=tardis_store.CSV_PATH, month=None, matcher=None):
+    df, report = clean_month(raw_path, month, matcher)
+    if df.empty:
+        return [], tardis_store.read_manifest(csv_path)["version"], report
+    written, version = write_months(df, csv_path)
+    return written, version, report
+
+
+def load_cube(csv_path=tardis_store.CSV_PATH):
+    # Cube complet assemblé à partir des tranches mensuelles déjà calculées
+    if not tardis_store.has_partitions(csv_path):
+        return None
+    cube = tardis_store.load_partitions(csv_path, tardis_store.CUBE_PART)
+    if cube is None:
+        return None
+    for col in ["year", "month"]:
+        cube[col] = cube[col].astype("int64")
+    return cube
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mise à jour incrémentale du dataset TARDIS")
+    parser.add_argument("--data", default=tardis_store.CSV_PATH, help="Dataset nettoyé")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("init", help="Découper le dataset nettoyé en partitions mensuelles")
+    append = sub.add_parser("append", help="Ajouter (ou remplacer) un mois")
+    append.add_argument("raw", help="Export brut SNCF du mois (format de dataset.csv)")
+    append.add_argument("--month", help="Mois à conserver (AAAA-MM)")
+    args = parser.parse_args(argv)
+
+    if args.command == "init":
+        written, version = init_partitions(args.data)
+    else:
+        written, version, report = append_month(args.raw, args.data, args.month)
+        tardis_cleaning.print_report(report)
+    print(f"✅ {len(written)} partitions écrites, version {version} : {', '.join(written)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import tardis_metrics
+
+# --- Préchauffage au démarrage ---
+# Les tâches (chargements, classements, première prédiction) tournent dans un
+# pool de threads, chacune lancée quand ses dépendances sont terminées. Le
+# drapeau de disponibilité passe à vrai quand tout est fini ; si un fichier de
+# disponibilité est configuré, il est écrit à ce moment-là (sonde readiness :
+# test -f "$TARDIS_READY_FILE").
+#
+#   warmup = Warmup(workers=4, ready_file="/tmp/tardis-ready")
+#   warmup.run({"data": (load, []), "cube": (build, ["data"])})
+#   warmup.wait(60); warmup.status_table()
+#
+# En ligne de commande, lance le préchauffage du dashboard avant le serveur
+# Streamlit, sans attendre une première visite (arguments suivants transmis
+# à streamlit run) :
+#
+#   TARDIS_READY_FILE=/tmp/tardis-ready python tardis_warmup.py --server.port 8501
+
+DEFAULT_WORKERS = 4
+THREAD_PREFIX = "tardis-warmup"
+STATUS_COLUMNS = ["task", "status", "seconds", "error"]
+
+
+class Warmup:
+    def __init__(
+        self,
+        workers=DEFAULT_WORKERS,
+        ready_file=None,
+        metrics=tardis_metrics.METRICS,
+    ):
+        self.workers = workers
+        self.ready_file = ready_file
+        self.metrics = metrics
+        self.status = {}
+        self.timings = {}
+        self.errors = {}
+        self.elapsed = None
+        self._tasks = {}
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._start = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def run(self, tasks):
+        # tasks : {nom: (fonction, [dépendances])}
+        unknown = {dep for _, deps in tasks.values() for dep in deps} - set(tasks)
+        if unknown:
+            raise ValueError(f"Dépendances inconnues : {', '.join(sorted(unknown))}")
+        self._tasks = tasks
+        self._start = time.perf_counter()
+        self.status = {name: "en attente" for name in tasks}
+        if not tasks:
+            self._finish()
+            return self
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=THREAD_PREFIX)
+        with self._lock:
+            runnable = self._runnable()
+        for name in runnable:
+            self._launch(name)
+        return self
+
+    def _runnable(self):
+        # Tâches en attente dont toutes les dépendances sont terminées
+        done = {name for name, status in self.status.items() if status in ("ok", "erreur")}
+        runnable = [
+            name
+            for name, (_, deps) in self._tasks.items()
+            if self.status[name] == "en attente" and set(deps) <= done
+        ]
+        for name in runnable:
+            self.status[name] = "en cours"
+        return runnable
+
+    def _launch(self, name):
+        self._executor.submit(self._execute, name)
+
+    def _execute(self, name):
+        # Une tâche en échec n'arrête pas les suivantes : elles rechargeront
+        # elles-mêmes ce dont elles ont besoin
+        func = self._tasks[name][0]
+        start = time.perf_counter()
+        try:
+            func()
+            status = "ok"
+        except Exception as error:
+            status = "erreur"
+            self.errors[name] = f"{type(error).__name__}: {error}"
+        seconds = time.perf_counter() - start
+        self.metrics.record(f"warmup:{name}", seconds)
+        with self._lock:
+            self.timings[name] = seconds
+            self.status[name] = status
+            runnable = self._runnable()
+            finished = all(s in ("ok", "erreur") for s in self.status.values())
+        for next_name in runnable:
+            self._launch(next_name)
+        if finished:
+            self._finish()
+
+    def _finish(self):
+        self.elapsed = time.perf_counter() - self._start
+        self.metrics.record("warmup", self.elapsed)
+        if self.ready_file:
+            with open(self.ready_file, "w", encoding="utf-8") as f:
+                f.write(f"{self.elapsed:.3f}\n")
+        self._ready.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        errors = f", {len(self.errors)} en échec" if self.errors else ""
+        print(
+            f"✅ Préchauffage terminé en {self.elapsed:.2f} s "
+            f"({len(self.status)} tâches{errors})"
+        )
+
+    def status_table(self):
+        with self._lock:
+            rows = [
+                {
+                    "task": name,
+                    "status": status,
+                    "seconds": self.timings.get(name),
+                    "error": self.errors.get(name, ""),
+                }
+                for name, status in self.status.items()
+            ]
+        return pd.DataFrame(rows, columns=STATUS_COLUMNS)
+
+
+def clear_ready_file(path):
+    # Au démarrage du processus : la sonde ne doit pas voir un fichier périmé
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Préchauffage du dashboard TARDIS puis lancement de Streamlit"
+    )
+    parser.add_argument("--script", default="tardis_dashboard.py")
+    args, streamlit_args = parser.parse_known_args(argv)
+
+    # Préchauffage lancé dans ce processus, celui du serveur : les sessions
+    # retrouvent le singleton déjà démarré et les caches remplis
+    import tardis_loaders
+    import tardis_predict
+    import tardis_store
+    from streamlit.web import cli
+
+    warmup = tardis_loaders.start_warmup(
+        tardis_store.data_version(), tardis_predict.model_version()
+    )
+    print(f"⏳ Préchauffage lancé ({len(warmup.status)} tâches)")
+
+    sys.argv = ["streamlit", "run", args.script, *streamlit_args]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()